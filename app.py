@@ -1,41 +1,431 @@
-from flask import Flask, request, jsonify, render_template, session, redirect, url_for
+from flask import Flask, request, jsonify, render_template, session, redirect, url_for, g, Response, stream_with_context
 from flask_cors import CORS
+from flask.json.provider import DefaultJSONProvider
 import sqlite3
 import json
 from datetime import datetime, timedelta
 import os
 import hashlib
-import secrets
+import hmac
+import threading
+import time
+import bcrypt
+from functools import lru_cache
+import orjson
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeoutError
 from dotenv import load_dotenv
 from calendar_integration import CalendarIntegration, SmartScheduler
-from dashboard import DashboardManager, HabitTracker
+from dashboard import SQLITE_CACHED_STATEMENTS, SQLITE_PRAGMAS, ConnectionPool, DashboardManager, HabitTracker
+import schema
 
 load_dotenv()
 
+class OrjsonProvider(DefaultJSONProvider):
+    """jsonify through orjson, keeping Flask's key order and date formatting"""
+    OPTIONS = orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+    
+    def dumps(self, obj, **kwargs):
+        option = self.OPTIONS
+        if kwargs.get('indent'):
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(obj, default=self.default, option=option).decode()
+    
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
 app = Flask(__name__)
+app.json = OrjsonProvider(app)
 CORS(app)
 app.secret_key = os.environ.get('SECRET_KEY', 'your-secret-key-change-this')
 
-# Initialize managers
-dashboard_manager = DashboardManager()
-habit_tracker = HabitTracker()
+# Keep sessions server-side in Redis when it is configured, signed cookies otherwise
+if os.environ.get('REDIS_URL'):
+    import redis
+    from flask_session import Session
+    app.config['SESSION_TYPE'] = 'redis'
+    app.config['SESSION_REDIS'] = redis.from_url(os.environ['REDIS_URL'])
+    Session(app)
+
+# The session may hold a copy of the user's preferences only when it lives in
+# Redis; in a signed cookie a large document (e.g. many ical_urls) would push
+# the cookie past the browser's ~4KB limit and the whole login would be dropped
+PREFERENCES_IN_SESSION = bool(os.environ.get('REDIS_URL'))
+
+# Database connection settings; STUDYSTREAK_DB_URL may be a path or a SQLite
+# URI such as file::memory:?cache=shared
+DATABASE = os.environ.get('STUDYSTREAK_DB_URL', 'accountability.db')
+
+OPTIMIZE_INTERVAL_SECONDS = 15 * 60
+
+# Rows fetched per round trip when streaming large result sets
+STREAM_BATCH_SIZE = 200
+
+# Distinct stored preference documents kept parsed in memory
+PREFERENCES_CACHE_SIZE = 1024
+
+# Habit progress is cached per user for the current time bucket; this process
+# clears it on every session write, the bucket bounds staleness from others
+HABIT_PROGRESS_CACHE_SIZE = 1024
+HABIT_PROGRESS_TTL_SECONDS = 60
+
+def get_conn(check_same_thread=True):
+    """Open a SQLite connection with the tuned pragmas applied"""
+    conn = sqlite3.connect(DATABASE, cached_statements=SQLITE_CACHED_STATEMENTS,
+                           check_same_thread=check_same_thread, uri=True)
+    for pragma in SQLITE_PRAGMAS:
+        conn.execute(pragma)
+    if app.config.get('TESTING'):
+        # Test data is throwaway, so skip fsync entirely
+        conn.execute('PRAGMA synchronous=OFF')
+    return conn
+
+# Initialize managers; the dashboard helpers share one pool of tuned
+# connections that outlive requests, so they may move between threads
+db_pool = ConnectionPool(lambda: get_conn(check_same_thread=False))
+dashboard_manager = DashboardManager(DATABASE, pool=db_pool)
+habit_tracker = HabitTracker(DATABASE, pool=db_pool)
 calendar_integration = CalendarIntegration()
 smart_scheduler = SmartScheduler(calendar_integration)
 
+def get_db():
+    """Get the connection for the current app context, opening it on first use"""
+    if 'db' not in g:
+        g.db = get_conn()
+        g.db.row_factory = sqlite3.Row
+    return g.db
+
+@app.teardown_appcontext
+def close_db(exception):
+    """Close the app-context connection at the end of the request"""
+    db = g.pop('db', None)
+    if db is not None:
+        db.close()
+
+def sql_json_response(cursor, default='[]'):
+    """Send the JSON document built by a json1 query straight to the client"""
+    row = cursor.fetchone()
+    body = row[0] if row and row[0] is not None else default
+    return Response(body, mimetype='application/json')
+
+def with_etag(response, etag):
+    """Attach a weak ETag and mark the response as varying by session cookie"""
+    response.set_etag(etag, weak=True)
+    response.vary.add('Cookie')
+    return response
+
+def query_etag(sql, params):
+    """Build an ETag from a cheap summary query over the rows behind an endpoint"""
+    cursor = get_db().cursor()
+    cursor.execute(sql, params)
+    return hashlib.sha1(repr(tuple(cursor.fetchone())).encode()).hexdigest()
+
+def not_modified(etag):
+    """Return 304 if the client already holds this version, otherwise None"""
+    if request.if_none_match.contains_weak(etag):
+        return with_etag(Response(status=304), etag)
+    return None
+
+def conditional_response(response):
+    """ETag a response from its body and turn it into a 304 when the client has it"""
+    response.add_etag(weak=True)
+    response.vary.add('Cookie')
+    return response.make_conditional(request)
+
+@lru_cache(maxsize=PREFERENCES_CACHE_SIZE)
+def parse_preferences(preferences_json):
+    """Parse a stored preferences document. Keyed on the raw string, so saving new
+    preferences misses the cache; callers must not mutate the shared result."""
+    return orjson.loads(preferences_json) if preferences_json else {}
+
+@lru_cache(maxsize=HABIT_PROGRESS_CACHE_SIZE)
+def compute_habit_progress(user_id, bucket):
+    """Habit progress and milestone rewards for a user; callers must not mutate the result"""
+    progress = habit_tracker.track_habit_progress(user_id)
+    return {
+        'progress': progress,
+        'rewards': habit_tracker.get_milestone_rewards(progress)
+    }
+
+def remember_preferences(preferences_json):
+    """Keep the logged-in user's preferences in a server-side session"""
+    if PREFERENCES_IN_SESSION:
+        session['preferences_json'] = preferences_json
+
+def get_user_preferences(user_id):
+    """Get a user's stored preferences, using the session copy for the logged-in user"""
+    is_session_user = session.get('user_id') == user_id
+    
+    if is_session_user and PREFERENCES_IN_SESSION and 'preferences_json' in session:
+        preferences_json = session['preferences_json']
+    else:
+        cursor = get_db().cursor()
+        cursor.execute(SQL_USER_PREFERENCES, (user_id,))
+        user_data = cursor.fetchone()
+        if not user_data:
+            return None
+        
+        preferences_json = user_data['preferences']
+        if is_session_user:
+            remember_preferences(preferences_json)
+    
+    return dict(parse_preferences(preferences_json))
+
+def get_user_preference(user_id, key, default):
+    """Get one preference, extracting just that key in SQLite when it isn't cached.
+    Returns None if the user doesn't exist."""
+    if session.get('user_id') == user_id and PREFERENCES_IN_SESSION and 'preferences_json' in session:
+        return get_user_preferences(user_id).get(key, default)
+    
+    cursor = get_db().cursor()
+    cursor.execute(SQL_USER_PREFERENCE, (f'$.{key}', user_id))
+    user_data = cursor.fetchone()
+    if not user_data:
+        return None
+    
+    value = json.loads(user_data['value'])
+    return default if value is None else value
+
+def optimize_db_periodically(interval=OPTIMIZE_INTERVAL_SECONDS):
+    """Run PRAGMA optimize on a fixed interval to keep query planner stats fresh"""
+    while True:
+        time.sleep(interval)
+        try:
+            conn = get_conn()
+            try:
+                conn.execute('PRAGMA optimize')
+            finally:
+                conn.close()
+        except sqlite3.Error as e:
+            print(f"Database optimize error: {e}")
+
+# SQL statements, defined once so every request reuses the same cached prepared statement
+SQL_USER_PREFERENCES = 'SELECT preferences FROM users WHERE id = ?'
+
+SQL_USER_PREFERENCE = "SELECT json_quote(json_extract(NULLIF(preferences, ''), ?)) AS value FROM users WHERE id = ?"
+
+SQL_UPDATE_PREFERENCES = '''
+    UPDATE users SET preferences = json_patch(COALESCE(NULLIF(preferences, ''), '{}'), ?)
+    WHERE id = ?
+'''
+
+SQL_CREATE_USER = '''
+    INSERT INTO users (username, email, password_hash, preferences)
+    VALUES (?, ?, ?, ?)
+'''
+
+SQL_LOGIN = 'SELECT id, username, email, password_hash, preferences FROM users WHERE email = ?'
+
+SQL_UPDATE_PASSWORD_HASH = 'UPDATE users SET password_hash = ? WHERE id = ?'
+
+# User documents are built in SQLite and embed the whole preferences object;
+# the ?summary=1 form drops the potentially long ical_urls list
+SQL_CURRENT_USER = '''
+    SELECT json_object(
+        'id', id,
+        'username', username,
+        'email', email,
+        'preferences', json(COALESCE(NULLIF(preferences, ''), '{}'))
+    ) AS body, preferences
+    FROM users WHERE id = ?
+'''
+
+SQL_CURRENT_USER_SUMMARY = '''
+    SELECT json_object(
+        'id', id,
+        'username', username,
+        'email', email,
+        'preferences', json_remove(COALESCE(NULLIF(preferences, ''), '{}'), '$.ical_urls')
+    )
+    FROM users WHERE id = ?
+'''
+
+SQL_GET_USER = '''
+    SELECT json_object(
+        'id', id,
+        'username', username,
+        'email', email,
+        'preferences', json(COALESCE(NULLIF(preferences, ''), '{}')),
+        'created_at', created_at
+    )
+    FROM users WHERE id = ?
+'''
+
+SQL_GET_USER_SUMMARY = '''
+    SELECT json_object(
+        'id', id,
+        'username', username,
+        'email', email,
+        'preferences', json_remove(COALESCE(NULLIF(preferences, ''), '{}'), '$.ical_urls'),
+        'created_at', created_at
+    )
+    FROM users WHERE id = ?
+'''
+
+SQL_ALL_GROUPS = '''
+    SELECT json_group_array(json_object(
+        'id', id,
+        'name', name,
+        'description', description,
+        'created_by', created_by,
+        'created_at', created_at,
+        'member_count', member_count
+    ))
+    FROM (
+        SELECT g.id, g.name, g.description, g.created_by, g.created_at,
+               COUNT(gm.user_id) AS member_count
+        FROM groups g
+        LEFT JOIN group_members gm ON g.id = gm.group_id
+        GROUP BY g.id, g.name, g.description, g.created_by, g.created_at
+        ORDER BY g.created_at DESC
+    )
+'''
+
+SQL_CREATE_GROUP = '''
+    INSERT INTO groups (name, description, created_by)
+    VALUES (?, ?, ?)
+'''
+
+SQL_ADD_GROUP_MEMBER = '''
+    INSERT INTO group_members (group_id, user_id)
+    VALUES (?, ?)
+'''
+
+SQL_GET_GROUP = '''
+    SELECT g.id AS id, g.name AS name, g.description AS description,
+           g.created_by AS created_by, g.created_at AS created_at,
+           COUNT(gm.user_id) AS member_count
+    FROM groups g
+    LEFT JOIN group_members gm ON g.id = gm.group_id
+    WHERE g.id = ?
+    GROUP BY g.id, g.name, g.description, g.created_by, g.created_at
+'''
+
+SQL_CREATE_STUDY_SESSION = '''
+    INSERT INTO study_sessions (user_id, start_time, end_time, subject, title, description, duration_minutes, location, notes)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+'''
+
+SQL_USER_STUDY_SESSIONS = '''
+    SELECT json_object(
+        'id', id,
+        'subject', subject,
+        'title', title,
+        'description', description,
+        'duration_minutes', duration_minutes,
+        'start_time', start_time,
+        'end_time', end_time,
+        'location', location,
+        'notes', notes,
+        'created_at', created_at,
+        'completed', json(CASE WHEN completed THEN 'true' ELSE 'false' END)
+    )
+    FROM study_sessions 
+    WHERE user_id = ? 
+    ORDER BY start_time DESC
+'''
+
+SQL_COMPLETE_STUDY_SESSION = '''
+    UPDATE study_sessions 
+    SET completed = TRUE, completed_at = CURRENT_TIMESTAMP
+    WHERE id = ?
+'''
+
+SQL_DELETE_STUDY_SESSION = 'DELETE FROM study_sessions WHERE id = ?'
+
+SQL_USER_STREAKS = '''
+    SELECT s.id AS id, s.user_id AS user_id, s.group_id AS group_id,
+           s.current_streak AS current_streak, s.longest_streak AS longest_streak,
+           s.last_activity AS last_activity, g.name AS group_name
+    FROM streaks s
+    LEFT JOIN groups g ON s.group_id = g.id
+    WHERE s.user_id = ?
+'''
+
+SQL_CREATE_ACCOMPLISHMENT = '''
+    INSERT INTO accomplishments (user_id, group_id, title, description, category)
+    VALUES (?, ?, ?, ?, ?)
+'''
+
+SQL_GROUP_ACCOMPLISHMENTS = '''
+    SELECT json_group_array(json_object(
+        'id', id,
+        'user_id', user_id,
+        'group_id', group_id,
+        'title', title,
+        'description', description,
+        'category', category,
+        'created_at', created_at,
+        'username', username
+    ))
+    FROM (
+        SELECT a.id, a.user_id, a.group_id, a.title, a.description, a.category,
+               a.created_at, u.username
+        FROM accomplishments a
+        JOIN users u ON a.user_id = u.id
+        WHERE a.group_id = ?
+        ORDER BY a.created_at DESC
+        LIMIT 50
+    )
+'''
+
+SQL_GROUP_ACCOMPLISHMENTS_VERSION = 'SELECT COUNT(*), MAX(id) FROM accomplishments WHERE group_id = ?'
+
+SQL_GROUP_STREAKS_VERSION = 'SELECT COUNT(*), MAX(last_activity) FROM streaks WHERE group_id = ?'
+
+SQL_GROUP_STREAKS = '''
+    SELECT json_group_array(json_object(
+        'user_id', user_id,
+        'current_streak', current_streak,
+        'longest_streak', longest_streak,
+        'last_activity', last_activity,
+        'username', username
+    ))
+    FROM (
+        SELECT s.user_id, s.current_streak, s.longest_streak, s.last_activity,
+               u.username
+        FROM streaks s
+        JOIN users u ON s.user_id = u.id
+        WHERE s.group_id = ?
+        ORDER BY s.current_streak DESC, s.longest_streak DESC
+    )
+'''
+
 # Password hashing functions
+BCRYPT_ROUNDS = 12
+
+# bcrypt runs on a bounded pool so login spikes can't take every CPU away
+# from the cheap routes served by the other worker threads
+verify_pool = ThreadPoolExecutor(max_workers=os.cpu_count() or 1)
+LOGIN_VERIFY_TIMEOUT_SECONDS = 2
+
 def hash_password(password):
-    """Hash a password using SHA-256 with salt"""
-    salt = secrets.token_hex(16)
-    password_hash = hashlib.sha256((password + salt).encode()).hexdigest()
-    return f"{salt}:{password_hash}"
+    """Hash a password using bcrypt"""
+    return bcrypt.hashpw(password.encode(), bcrypt.gensalt(rounds=BCRYPT_ROUNDS)).decode()
+
+# Verified against when no user matches, so unknown emails cost the same as bad passwords
+DUMMY_HASH = bcrypt.hashpw(b'timingdummy', bcrypt.gensalt(rounds=BCRYPT_ROUNDS)).decode()
+
+def needs_rehash(stored_hash):
+    """Check whether a stored hash predates the bcrypt switch"""
+    return not stored_hash.startswith('$2')
 
 def verify_password(password, stored_hash):
     """Verify a password against its hash"""
-    try:
-        salt, password_hash = stored_hash.split(':')
-        return hashlib.sha256((password + salt).encode()).hexdigest() == password_hash
-    except:
+    if not stored_hash:
         return False
+    
+    if not needs_rehash(stored_hash):
+        # bcrypt.checkpw compares the digests in constant time
+        try:
+            return bcrypt.checkpw(password.encode(), stored_hash.encode())
+        except ValueError:
+            return False
+    
+    # Legacy salt:sha256 rows, kept until the user logs in again
+    # Malformed rows still hash and compare so they don't return any faster
+    salt, separator, password_hash = stored_hash.partition(':')
+    candidate = hashlib.sha256((password + salt).encode()).hexdigest()
+    return hmac.compare_digest(candidate, password_hash) and bool(separator)
 
 def require_auth(f):
     """Decorator to require authentication"""
@@ -46,121 +436,16 @@ def require_auth(f):
     decorated_function.__name__ = f.__name__
     return decorated_function
 
-# Database initialization
+# Database initialization; the DDL lives in schema.py so migrate_db.py can
+# share it without importing the app. Run with `flask --app app init-db`
 def init_db():
-    conn = sqlite3.connect('accountability.db')
-    cursor = conn.cursor()
-    
-    # Users table
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS users (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            username TEXT UNIQUE NOT NULL,
-            email TEXT UNIQUE NOT NULL,
-            preferences TEXT,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-    ''')
-    
-    # Check if password_hash column exists, if not add it
-    cursor.execute("PRAGMA table_info(users)")
-    columns = [column[1] for column in cursor.fetchall()]
-    
-    if 'password_hash' not in columns:
-        print("Adding password_hash column to existing users table...")
-        cursor.execute('ALTER TABLE users ADD COLUMN password_hash TEXT')
-        # Set default for existing users
-        cursor.execute('UPDATE users SET password_hash = ? WHERE password_hash IS NULL', 
-                      ('default:needs_reset',))
-    
-    # Groups table
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS groups (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            name TEXT NOT NULL,
-            description TEXT,
-            created_by INTEGER,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (created_by) REFERENCES users (id)
-        )
-    ''')
-    
-    # Group members table
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS group_members (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            group_id INTEGER,
-            user_id INTEGER,
-            joined_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (group_id) REFERENCES groups (id),
-            FOREIGN KEY (user_id) REFERENCES users (id)
-        )
-    ''')
-    
-    # Study sessions table
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS study_sessions (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            user_id INTEGER,
-            start_time TIMESTAMP,
-            end_time TIMESTAMP,
-            subject TEXT,
-            completed BOOLEAN DEFAULT FALSE,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (user_id) REFERENCES users (id)
-        )
-    ''')
-    
-    # Check if new columns exist in study_sessions table, add them if not
-    cursor.execute("PRAGMA table_info(study_sessions)")
-    columns = [column[1] for column in cursor.fetchall()]
-    
-    new_columns = [
-        ('title', 'TEXT'),
-        ('description', 'TEXT'),
-        ('duration_minutes', 'INTEGER'),
-        ('location', 'TEXT'),
-        ('notes', 'TEXT'),
-        ('completed_at', 'TIMESTAMP')
-    ]
-    
-    for col_name, col_type in new_columns:
-        if col_name not in columns:
-            print(f"Adding {col_name} column to study_sessions table...")
-            cursor.execute(f'ALTER TABLE study_sessions ADD COLUMN {col_name} {col_type}')
-    
-    # Streaks table
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS streaks (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            user_id INTEGER,
-            group_id INTEGER,
-            current_streak INTEGER DEFAULT 0,
-            longest_streak INTEGER DEFAULT 0,
-            last_activity TIMESTAMP,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (user_id) REFERENCES users (id),
-            FOREIGN KEY (group_id) REFERENCES groups (id)
-        )
-    ''')
-    
-    # Accomplishments table
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS accomplishments (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            user_id INTEGER,
-            group_id INTEGER,
-            title TEXT NOT NULL,
-            description TEXT,
-            category TEXT,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (user_id) REFERENCES users (id),
-            FOREIGN KEY (group_id) REFERENCES groups (id)
-        )
-    ''')
-    
-    conn.commit()
-    conn.close()
+    """Create the schema on DATABASE, or bring it up to SCHEMA_VERSION.
+    Returns False if it was already current."""
+    conn = get_conn()
+    try:
+        return schema.init_db(conn)
+    finally:
+        conn.close()
 
 @app.route('/')
 def index():
@@ -197,21 +482,22 @@ def create_user():
     else:
         password_hash = 'default:needs_reset'
     
-    conn = sqlite3.connect('accountability.db')
+    conn = get_db()
     cursor = conn.cursor()
     
+    preferences_json = json.dumps(data.get('preferences', {}))
+    
     try:
-        cursor.execute('''
-            INSERT INTO users (username, email, password_hash, preferences)
-            VALUES (?, ?, ?, ?)
-        ''', (data['username'], data['email'], password_hash, json.dumps(data.get('preferences', {}))))
+        cursor.execute(SQL_CREATE_USER, (data['username'], data['email'], password_hash, preferences_json))
         
         user_id = cursor.lastrowid
         conn.commit()
+        compute_habit_progress.cache_clear()
         
         # Set session
         session['user_id'] = user_id
         session['username'] = data['username']
+        remember_preferences(preferences_json)
         
         return jsonify({
             'id': user_id,
@@ -222,8 +508,6 @@ def create_user():
         }), 201
     except sqlite3.IntegrityError:
         return jsonify({'error': 'Username or email already exists'}), 400
-    finally:
-        conn.close()
 
 # Authentication endpoints
 @app.route('/api/auth/login', methods=['POST'])
@@ -233,29 +517,43 @@ def login():
     if not all(key in data for key in ['email', 'password']):
         return jsonify({'error': 'Email and password required'}), 400
     
-    conn = sqlite3.connect('accountability.db')
+    conn = get_db()
     cursor = conn.cursor()
     
+    cursor.execute(SQL_LOGIN, (data['email'],))
+    user = cursor.fetchone()
+    
+    # Unknown emails still pay for a full bcrypt check against a dummy hash
+    stored_hash = user['password_hash'] if user else DUMMY_HASH
+    verification = verify_pool.submit(verify_password, data['password'], stored_hash)
     try:
-        cursor.execute('SELECT id, username, email, password_hash, preferences FROM users WHERE email = ?', (data['email'],))
-        user = cursor.fetchone()
+        password_ok = verification.result(timeout=LOGIN_VERIFY_TIMEOUT_SECONDS) and user is not None
+    except FuturesTimeoutError:
+        # Drop the check if it is still queued, so abandoned logins don't pile
+        # up behind the pool (one already running can't be stopped)
+        verification.cancel()
+        return jsonify({'error': 'Login temporarily unavailable, please try again'}), 503
+    
+    if password_ok:
+        # Upgrade legacy SHA-256 hashes now that we know the plaintext
+        if needs_rehash(user['password_hash']):
+            cursor.execute(SQL_UPDATE_PASSWORD_HASH, (hash_password(data['password']), user['id']))
+            conn.commit()
         
-        if user and verify_password(data['password'], user[3]):
-            # Set session
-            session['user_id'] = user[0]
-            session['username'] = user[1]
-            
-            return jsonify({
-                'id': user[0],
-                'username': user[1],
-                'email': user[2],
-                'preferences': json.loads(user[4]) if user[4] else {},
-                'message': 'Login successful'
-            }), 200
-        else:
-            return jsonify({'error': 'Invalid email or password'}), 401
-    finally:
-        conn.close()
+        # Set session
+        session['user_id'] = user['id']
+        session['username'] = user['username']
+        remember_preferences(user['preferences'])
+        
+        return jsonify({
+            'id': user['id'],
+            'username': user['username'],
+            'email': user['email'],
+            'preferences': json.loads(user['preferences']) if user['preferences'] else {},
+            'message': 'Login successful'
+        }), 200
+    else:
+        return jsonify({'error': 'Invalid email or password'}), 401
 
 @app.route('/api/auth/logout', methods=['POST'])
 def logout():
@@ -267,216 +565,202 @@ def get_current_user():
     if 'user_id' not in session:
         return jsonify({'error': 'Not authenticated'}), 401
     
-    conn = sqlite3.connect('accountability.db')
+    conn = get_db()
     cursor = conn.cursor()
     
-    try:
-        cursor.execute('SELECT id, username, email, preferences FROM users WHERE id = ?', (session['user_id'],))
-        user = cursor.fetchone()
-        
-        if user:
-            return jsonify({
-                'id': user[0],
-                'username': user[1],
-                'email': user[2],
-                'preferences': json.loads(user[3]) if user[3] else {}
-            })
-        else:
-            return jsonify({'error': 'User not found'}), 404
-    finally:
-        conn.close()
+    summary = request.args.get('summary') == '1'
+    cursor.execute(SQL_CURRENT_USER_SUMMARY if summary else SQL_CURRENT_USER, (session['user_id'],))
+    user = cursor.fetchone()
+    
+    if user:
+        if not summary:
+            remember_preferences(user['preferences'])
+        return Response(user[0], mimetype='application/json')
+    else:
+        return jsonify({'error': 'User not found'}), 404
 
 @app.route('/api/users/<int:user_id>', methods=['GET'])
 def get_user(user_id):
-    conn = sqlite3.connect('accountability.db')
+    conn = get_db()
     cursor = conn.cursor()
     
-    cursor.execute('SELECT id, username, email, preferences, created_at FROM users WHERE id = ?', (user_id,))
+    summary = request.args.get('summary') == '1'
+    cursor.execute(SQL_GET_USER_SUMMARY if summary else SQL_GET_USER, (user_id,))
     user = cursor.fetchone()
-    conn.close()
     
     if user:
-        return jsonify({
-            'id': user[0],
-            'username': user[1],
-            'email': user[2],
-            'preferences': json.loads(user[3]) if user[3] else {},
-            'created_at': user[4]
-        })
+        return conditional_response(Response(user[0], mimetype='application/json'))
     else:
         return jsonify({'error': 'User not found'}), 404
 
+@app.route('/api/users/<int:user_id>/preferences', methods=['PATCH'])
+def update_user_preferences(user_id):
+    """Merge the given keys into a user's stored preferences"""
+    data = request.get_json()
+    
+    if not isinstance(data, dict) or not data:
+        return jsonify({'error': 'A JSON object of preferences is required'}), 400
+    
+    conn = get_db()
+    cursor = conn.cursor()
+    
+    # json_patch merges in SQLite, so the stored document never round-trips through Python
+    cursor.execute(SQL_UPDATE_PREFERENCES, (json.dumps(data), user_id))
+    
+    if cursor.rowcount == 0:
+        return jsonify({'error': 'User not found'}), 404
+    
+    conn.commit()
+    
+    # Drop this session's copy so its next read picks up the merged document;
+    # the user's other Redis sessions re-read after their next login
+    if session.get('user_id') == user_id:
+        session.pop('preferences_json', None)
+    
+    return jsonify({'message': 'Preferences updated'}), 200
+
 # Group management endpoints
 @app.route('/api/groups', methods=['GET'])
 def get_all_groups():
     """Get all available groups"""
-    conn = sqlite3.connect('accountability.db')
+    conn = get_db()
     cursor = conn.cursor()
     
-    try:
-        cursor.execute('''
-            SELECT g.id, g.name, g.description, g.created_by, g.created_at,
-                   COUNT(gm.user_id) as member_count
-            FROM groups g
-            LEFT JOIN group_members gm ON g.id = gm.group_id
-            GROUP BY g.id, g.name, g.description, g.created_by, g.created_at
-            ORDER BY g.created_at DESC
-        ''')
-        
-        groups = cursor.fetchall()
-        
-        return jsonify([{
-            'id': group[0],
-            'name': group[1],
-            'description': group[2],
-            'created_by': group[3],
-            'created_at': group[4],
-            'member_count': group[5]
-        } for group in groups])
-    finally:
-        conn.close()
+    cursor.execute(SQL_ALL_GROUPS)
+    
+    return sql_json_response(cursor)
 
 @app.route('/api/groups', methods=['POST'])
 def create_group():
     data = request.get_json()
-    conn = sqlite3.connect('accountability.db')
+    conn = get_db()
     cursor = conn.cursor()
     
-    try:
-        cursor.execute('''
-            INSERT INTO groups (name, description, created_by)
-            VALUES (?, ?, ?)
-        ''', (data['name'], data.get('description', ''), data['created_by']))
+    # Create the group and add its creator as a member in one transaction
+    with conn:
+        cursor.execute(SQL_CREATE_GROUP, (data['name'], data.get('description', ''), data['created_by']))
         
         group_id = cursor.lastrowid
         
-        # Add creator as member
-        cursor.execute('''
-            INSERT INTO group_members (group_id, user_id)
-            VALUES (?, ?)
-        ''', (group_id, data['created_by']))
-        
-        conn.commit()
-        
-        return jsonify({
-            'id': group_id,
-            'name': data['name'],
-            'description': data.get('description', ''),
-            'created_by': data['created_by']
-        }), 201
-    finally:
-        conn.close()
+        cursor.execute(SQL_ADD_GROUP_MEMBER, (group_id, data['created_by']))
+    
+    return jsonify({
+        'id': group_id,
+        'name': data['name'],
+        'description': data.get('description', ''),
+        'created_by': data['created_by']
+    }), 201
 
 @app.route('/api/groups/<int:group_id>', methods=['GET'])
 def get_group(group_id):
     """Get details for a specific group"""
-    conn = sqlite3.connect('accountability.db')
+    conn = get_db()
     cursor = conn.cursor()
     
-    try:
-        cursor.execute('''
-            SELECT g.id, g.name, g.description, g.created_by, g.created_at,
-                   COUNT(gm.user_id) as member_count
-            FROM groups g
-            LEFT JOIN group_members gm ON g.id = gm.group_id
-            WHERE g.id = ?
-            GROUP BY g.id, g.name, g.description, g.created_by, g.created_at
-        ''', (group_id,))
-        
-        group = cursor.fetchone()
-        
-        if group:
-            return jsonify({
-                'id': group[0],
-                'name': group[1],
-                'description': group[2],
-                'created_by': group[3],
-                'created_at': group[4],
-                'member_count': group[5]
-            })
-        else:
-            return jsonify({'error': 'Group not found'}), 404
-    finally:
-        conn.close()
+    cursor.execute(SQL_GET_GROUP, (group_id,))
+    
+    group = cursor.fetchone()
+    
+    if group:
+        return conditional_response(jsonify(dict(group)))
+    else:
+        return jsonify({'error': 'Group not found'}), 404
 
 @app.route('/api/groups/<int:group_id>/join', methods=['POST'])
 def join_group(group_id):
     data = request.get_json()
-    conn = sqlite3.connect('accountability.db')
+    conn = get_db()
     cursor = conn.cursor()
     
     try:
-        cursor.execute('''
-            INSERT INTO group_members (group_id, user_id)
-            VALUES (?, ?)
-        ''', (group_id, data['user_id']))
+        cursor.execute(SQL_ADD_GROUP_MEMBER, (group_id, data['user_id']))
         
         conn.commit()
         return jsonify({'message': 'Successfully joined group'}), 200
     except sqlite3.IntegrityError:
         return jsonify({'error': 'Already a member of this group'}), 400
-    finally:
-        conn.close()
+
+@app.route('/api/groups/<int:group_id>/join_many', methods=['POST'])
+def join_group_many(group_id):
+    """Add several users to a group in a single transaction"""
+    data = request.get_json()
+    user_ids = data.get('user_ids')
+    
+    # bool is an int subclass, but true/false are not user ids
+    if (not isinstance(user_ids, list) or not user_ids
+            or not all(type(user_id) is int for user_id in user_ids)):
+        return jsonify({'error': 'user_ids must be a non-empty list of integers'}), 400
+    
+    # group_members has no unique constraint, so a repeated id would join twice
+    user_ids = list(dict.fromkeys(user_ids))
+    
+    conn = get_db()
+    
+    try:
+        with conn:
+            conn.executemany(SQL_ADD_GROUP_MEMBER, [(group_id, user_id) for user_id in user_ids])
+        
+        return jsonify({
+            'message': 'Successfully joined group',
+            'joined': len(user_ids)
+        }), 200
+    except sqlite3.IntegrityError:
+        return jsonify({'error': 'One or more users are already members of this group'}), 400
 
 # Study session endpoints
 @app.route('/api/study-sessions', methods=['POST'])
 def create_study_session():
     data = request.get_json()
-    conn = sqlite3.connect('accountability.db')
+    conn = get_db()
     cursor = conn.cursor()
     
-    try:
-        # Create study session in database
-        cursor.execute('''
-            INSERT INTO study_sessions (user_id, start_time, end_time, subject, title, description, duration_minutes, location, notes)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-        ''', (
-            data['user_id'],
-            data['start_time'],
-            data['end_time'],
-            data['subject'],
-            data.get('title', data['subject']),
-            data.get('description', ''),
-            data.get('duration_minutes', 120),
-            data.get('location', ''),
-            data.get('notes', '')
-        ))
-        
-        session_id = cursor.lastrowid
-        conn.commit()
-        
-        # Create Google Calendar event if user has calendar integration
-        google_event = None
-        if data.get('add_to_calendar', False):
-            try:
-                from datetime import datetime
-                start_time = datetime.fromisoformat(data['start_time'].replace('Z', '+00:00'))
-                end_time = datetime.fromisoformat(data['end_time'].replace('Z', '+00:00'))
-                
-                google_event = calendar_integration.create_google_event(
-                    title=data.get('title', data['subject']),
-                    description=data.get('description', data.get('notes', '')),
-                    start_time=start_time,
-                    end_time=end_time
-                )
-            except Exception as e:
-                print(f"Failed to create Google Calendar event: {e}")
-        
-        return jsonify({
-            'id': session_id,
-            'user_id': data['user_id'],
-            'start_time': data['start_time'],
-            'end_time': data['end_time'],
-            'subject': data['subject'],
-            'title': data.get('title', data['subject']),
-            'description': data.get('description', ''),
-            'duration_minutes': data.get('duration_minutes', 120),
-            'location': data.get('location', ''),
-            'notes': data.get('notes', ''),
-            'google_event': google_event
-        }), 201
-    finally:
-        conn.close()
+    # Create study session in database
+    cursor.execute(SQL_CREATE_STUDY_SESSION, (
+        data['user_id'],
+        data['start_time'],
+        data['end_time'],
+        data['subject'],
+        data.get('title', data['subject']),
+        data.get('description', ''),
+        data.get('duration_minutes', 120),
+        data.get('location', ''),
+        data.get('notes', '')
+    ))
+    
+    session_id = cursor.lastrowid
+    conn.commit()
+    compute_habit_progress.cache_clear()
+    
+    # Create Google Calendar event if user has calendar integration
+    google_event = None
+    if data.get('add_to_calendar', False):
+        try:
+            from datetime import datetime
+            start_time = datetime.fromisoformat(data['start_time'].replace('Z', '+00:00'))
+            end_time = datetime.fromisoformat(data['end_time'].replace('Z', '+00:00'))
+            
+            google_event = calendar_integration.create_google_event(
+                title=data.get('title', data['subject']),
+                description=data.get('description', data.get('notes', '')),
+                start_time=start_time,
+                end_time=end_time
+            )
+        except Exception as e:
+            print(f"Failed to create Google Calendar event: {e}")
+    
+    return jsonify({
+        'id': session_id,
+        'user_id': data['user_id'],
+        'start_time': data['start_time'],
+        'end_time': data['end_time'],
+        'subject': data['subject'],
+        'title': data.get('title', data['subject']),
+        'description': data.get('description', ''),
+        'duration_minutes': data.get('duration_minutes', 120),
+        'location': data.get('location', ''),
+        'notes': data.get('notes', ''),
+        'google_event': google_event
+    }), 201
 
 @app.route('/api/study-sessions/suggest', methods=['POST'])
 def suggest_study_sessions():
@@ -485,39 +769,43 @@ def suggest_study_sessions():
     
     try:
         # Get user preferences
-        conn = sqlite3.connect('accountability.db')
-        cursor = conn.cursor()
-        cursor.execute('SELECT study_preferences, primary_subject FROM users WHERE id = ?', (data['user_id'],))
-        user = cursor.fetchone()
-        conn.close()
+        stored_preferences = get_user_preferences(data['user_id'])
         
-        if not user:
+        if stored_preferences is None:
             return jsonify({'error': 'User not found'}), 404
         
-        # Parse user preferences
+        # Stored preferences override the defaults
+        primary_subject = stored_preferences.get('primary_subject')
         preferences = {
             'preferred_study_hours': [9, 14, 19],  # Default hours
-            'subjects': [user[1]] if user[1] else ['General Study']
+            'subjects': [primary_subject] if primary_subject else ['General Study'],
+            **stored_preferences
         }
         
-        if user[0]:
-            try:
-                import json
-                user_prefs = json.loads(user[0])
-                preferences.update(user_prefs)
-            except:
-                pass
-        
         # Generate suggestions
         suggestions = smart_scheduler.suggest_study_sessions_from_work(
             data['work_description'], 
             preferences
         )
         
-        return jsonify({
+        result = {
             'suggestions': suggestions,
             'work_description': data['work_description']
-        }), 200
+        }
+        
+        # Put every suggested session on the calendar in one batched request
+        if data.get('add_to_calendar', False):
+            try:
+                result['google_events'] = calendar_integration.create_google_events_batch([{
+                    'title': suggestion['title'],
+                    'description': suggestion['description'],
+                    'start_time': datetime.fromisoformat(suggestion['start_time']),
+                    'end_time': datetime.fromisoformat(suggestion['end_time'])
+                } for suggestion in suggestions])
+            except Exception as e:
+                print(f"Failed to create Google Calendar events: {e}")
+        
+        return jsonify(result), 200
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -525,117 +813,82 @@ def suggest_study_sessions():
 @app.route('/api/study-sessions/<int:user_id>', methods=['GET'])
 def get_user_study_sessions(user_id):
     """Get all study sessions for a user"""
-    conn = sqlite3.connect('accountability.db')
+    conn = get_db()
     cursor = conn.cursor()
     
-    try:
-        cursor.execute('''
-            SELECT id, subject, title, description, duration_minutes, start_time, end_time,
-                   location, notes, created_at, completed
-            FROM study_sessions 
-            WHERE user_id = ? 
-            ORDER BY start_time DESC
-        ''', (user_id,))
-        
-        sessions = []
-        for row in cursor.fetchall():
-            sessions.append({
-                'id': row[0],
-                'subject': row[1],
-                'title': row[2],
-                'description': row[3],
-                'duration_minutes': row[4],
-                'start_time': row[5],
-                'end_time': row[6],
-                'location': row[7],
-                'notes': row[8],
-                'created_at': row[9],
-                'completed': bool(row[10]) if row[10] is not None else False
-            })
-        
-        return jsonify({'sessions': sessions}), 200
-    finally:
-        conn.close()
+    cursor.arraysize = STREAM_BATCH_SIZE
+    cursor.execute(SQL_USER_STUDY_SESSIONS, (user_id,))
+    
+    # Stream the list a batch of rows at a time instead of building it in memory
+    def generate():
+        yield '{"sessions": ['
+        count = 0
+        rows = cursor.fetchmany()
+        while rows:
+            yield (',' if count else '') + ','.join(row[0] for row in rows)
+            count += len(rows)
+            rows = cursor.fetchmany()
+        yield f'], "count": {count}}}'
+    
+    return Response(stream_with_context(generate()), mimetype='application/json')
 
 @app.route('/api/study-sessions/<int:session_id>/complete', methods=['PUT'])
 def complete_study_session(session_id):
-    conn = sqlite3.connect('accountability.db')
+    conn = get_db()
     cursor = conn.cursor()
     
-    try:
-        cursor.execute('''
-            UPDATE study_sessions 
-            SET completed = TRUE, completed_at = CURRENT_TIMESTAMP
-            WHERE id = ?
-        ''', (session_id,))
-        
-        if cursor.rowcount == 0:
-            return jsonify({'error': 'Session not found'}), 404
-        
-        conn.commit()
-        return jsonify({'message': 'Study session completed'}), 200
-    finally:
-        conn.close()
+    cursor.execute(SQL_COMPLETE_STUDY_SESSION, (session_id,))
+    
+    if cursor.rowcount == 0:
+        return jsonify({'error': 'Session not found'}), 404
+    
+    conn.commit()
+    compute_habit_progress.cache_clear()
+    return jsonify({'message': 'Study session completed'}), 200
 
 @app.route('/api/study-sessions/<int:session_id>', methods=['DELETE'])
 def delete_study_session(session_id):
-    conn = sqlite3.connect('accountability.db')
+    conn = get_db()
     cursor = conn.cursor()
     
-    try:
-        cursor.execute('DELETE FROM study_sessions WHERE id = ?', (session_id,))
-        
-        if cursor.rowcount == 0:
-            return jsonify({'error': 'Session not found'}), 404
-        
-        conn.commit()
-        return jsonify({'message': 'Study session deleted'}), 200
-    finally:
-        conn.close()
+    cursor.execute(SQL_DELETE_STUDY_SESSION, (session_id,))
+    
+    if cursor.rowcount == 0:
+        return jsonify({'error': 'Session not found'}), 404
+    
+    conn.commit()
+    compute_habit_progress.cache_clear()
+    return jsonify({'message': 'Study session deleted'}), 200
 
 # Streak management
 @app.route('/api/streaks/<int:user_id>', methods=['GET'])
 def get_user_streaks(user_id):
-    conn = sqlite3.connect('accountability.db')
+    conn = get_db()
     cursor = conn.cursor()
     
-    cursor.execute('''
-        SELECT s.*, g.name as group_name
-        FROM streaks s
-        LEFT JOIN groups g ON s.group_id = g.id
-        WHERE s.user_id = ?
-    ''', (user_id,))
-    
-    streaks = cursor.fetchall()
-    conn.close()
-    
-    return jsonify([{
-        'id': streak[0],
-        'user_id': streak[1],
-        'group_id': streak[2],
-        'current_streak': streak[3],
-        'longest_streak': streak[4],
-        'last_activity': streak[5],
-        'group_name': streak[7]
-    } for streak in streaks])
+    cursor.execute(SQL_USER_STREAKS, (user_id,))
+    
+    return jsonify([dict(streak) for streak in cursor.fetchall()])
 
 # Dashboard endpoints
 @app.route('/api/dashboard/<int:user_id>', methods=['GET'])
 def get_dashboard(user_id):
-    """Get comprehensive dashboard data for a user"""
-    dashboard_data = dashboard_manager.get_user_dashboard(user_id)
-    return jsonify(dashboard_data)
+    """Get comprehensive dashboard data for a user.
+    Pass the created_at (and id) of the last recent session as ?before=&before_id=
+    to page further back through recent_sessions."""
+    before = request.args.get('before')
+    if before:
+        dashboard_json = dashboard_manager.get_user_dashboard_json(
+            user_id, before=(before, request.args.get('before_id', 0, type=int)))
+    else:
+        dashboard_json = dashboard_manager.get_user_dashboard_json(user_id)
+    return conditional_response(Response(dashboard_json, mimetype='application/json'))
 
 @app.route('/api/dashboard/<int:user_id>/habit-progress', methods=['GET'])
 def get_habit_progress(user_id):
     """Get habit formation progress for a user"""
-    progress = habit_tracker.track_habit_progress(user_id)
-    rewards = habit_tracker.get_milestone_rewards(progress)
-    
-    return jsonify({
-        'progress': progress,
-        'rewards': rewards
-    })
+    bucket = int(time.time() // HABIT_PROGRESS_TTL_SECONDS)
+    return conditional_response(jsonify(compute_habit_progress(user_id, bucket)))
 
 @app.route('/api/dashboard/<int:user_id>/weekly-progress', methods=['GET'])
 def get_weekly_progress(user_id):
@@ -689,18 +942,11 @@ def get_calendar_events():
     end_time = datetime.fromisoformat(end_date)
     
     # Get user's calendar URLs from preferences
-    conn = sqlite3.connect('accountability.db')
-    cursor = conn.cursor()
-    cursor.execute('SELECT preferences FROM users WHERE id = ?', (user_id,))
-    user_data = cursor.fetchone()
-    conn.close()
+    ical_urls = get_user_preference(user_id, 'ical_urls', [])
     
-    if not user_data:
+    if ical_urls is None:
         return jsonify({'error': 'User not found'}), 404
     
-    preferences = json.loads(user_data[0]) if user_data[0] else {}
-    ical_urls = preferences.get('ical_urls', [])
-    
     events = calendar_integration.get_all_events(ical_urls, start_time, end_time)
     return jsonify(events)
 
@@ -712,15 +958,10 @@ def recommend_schedule():
     user_id = data['user_id']
     preferences = data.get('preferences', {})
     
-    # Get user preferences from database
-    conn = sqlite3.connect('accountability.db')
-    cursor = conn.cursor()
-    cursor.execute('SELECT preferences FROM users WHERE id = ?', (user_id,))
-    user_data = cursor.fetchone()
-    conn.close()
+    # Get user's stored preferences
+    db_preferences = get_user_preferences(user_id)
     
-    if user_data and user_data[0]:
-        db_preferences = json.loads(user_data[0])
+    if db_preferences:
         # Merge with provided preferences
         preferences = {**db_preferences, **preferences}
     
@@ -735,99 +976,77 @@ def recommend_schedule():
 # Accomplishments endpoints
 @app.route('/api/accomplishments', methods=['POST'])
 def create_accomplishment():
-    """Create a new accomplishment post"""
+    """Create a new accomplishment post, or several when given an 'accomplishments' list"""
     data = request.get_json()
+    posts = data.get('accomplishments', [data])
     
-    if not all(key in data for key in ['user_id', 'group_id', 'title']):
+    if not posts or not all(all(key in post for key in ['user_id', 'group_id', 'title']) for post in posts):
         return jsonify({'error': 'Missing required fields'}), 400
     
-    conn = sqlite3.connect('accountability.db')
+    conn = get_db()
     cursor = conn.cursor()
+    rows = [(post['user_id'], post['group_id'], post['title'],
+             post.get('description', ''), post.get('category', 'general')) for post in posts]
     
-    try:
-        cursor.execute('''
-            INSERT INTO accomplishments (user_id, group_id, title, description, category)
-            VALUES (?, ?, ?, ?, ?)
-        ''', (data['user_id'], data['group_id'], data['title'], 
-              data.get('description', ''), data.get('category', 'general')))
-        
-        accomplishment_id = cursor.lastrowid
-        conn.commit()
-        
-        # Update streak for this user in this group
-        dashboard_manager.update_streak(data['user_id'], data['group_id'])
+    # Insert the posts and update the matching streaks in one transaction
+    with conn:
+        if 'accomplishments' in data:
+            cursor.executemany(SQL_CREATE_ACCOMPLISHMENT, rows)
+        else:
+            cursor.execute(SQL_CREATE_ACCOMPLISHMENT, rows[0])
+            accomplishment_id = cursor.lastrowid
         
+        for post in posts:
+            dashboard_manager.update_streak(post['user_id'], post['group_id'], conn=conn)
+    
+    for group_id in {post['group_id'] for post in posts}:
+        dashboard_manager.invalidate_leaderboard(group_id)
+    
+    if 'accomplishments' in data:
         return jsonify({
-            'id': accomplishment_id,
-            'user_id': data['user_id'],
-            'group_id': data['group_id'],
-            'title': data['title'],
-            'description': data.get('description', ''),
-            'category': data.get('category', 'general'),
-            'created_at': datetime.now().isoformat()
+            'message': 'Accomplishments created successfully',
+            'count': len(rows)
         }), 201
-    finally:
-        conn.close()
+    
+    return jsonify({
+        'id': accomplishment_id,
+        'user_id': data['user_id'],
+        'group_id': data['group_id'],
+        'title': data['title'],
+        'description': data.get('description', ''),
+        'category': data.get('category', 'general'),
+        'created_at': datetime.now().isoformat()
+    }), 201
 
 @app.route('/api/groups/<int:group_id>/accomplishments', methods=['GET'])
 def get_group_accomplishments(group_id):
     """Get all accomplishments for a specific group"""
-    conn = sqlite3.connect('accountability.db')
+    etag = query_etag(SQL_GROUP_ACCOMPLISHMENTS_VERSION, (group_id,))
+    cached = not_modified(etag)
+    if cached:
+        return cached
+    
+    conn = get_db()
     cursor = conn.cursor()
     
-    try:
-        cursor.execute('''
-            SELECT a.id, a.user_id, a.group_id, a.title, a.description, a.category, a.created_at,
-                   u.username
-            FROM accomplishments a
-            JOIN users u ON a.user_id = u.id
-            WHERE a.group_id = ?
-            ORDER BY a.created_at DESC
-            LIMIT 50
-        ''', (group_id,))
-        
-        accomplishments = cursor.fetchall()
-        
-        return jsonify([{
-            'id': acc[0],
-            'user_id': acc[1],
-            'group_id': acc[2],
-            'title': acc[3],
-            'description': acc[4],
-            'category': acc[5],
-            'created_at': acc[6],
-            'username': acc[7]
-        } for acc in accomplishments])
-    finally:
-        conn.close()
+    cursor.execute(SQL_GROUP_ACCOMPLISHMENTS, (group_id,))
+    
+    return with_etag(sql_json_response(cursor), etag)
 
 @app.route('/api/groups/<int:group_id>/streaks', methods=['GET'])
 def get_group_streaks(group_id):
     """Get streak information for all members of a group"""
-    conn = sqlite3.connect('accountability.db')
+    etag = query_etag(SQL_GROUP_STREAKS_VERSION, (group_id,))
+    cached = not_modified(etag)
+    if cached:
+        return cached
+    
+    conn = get_db()
     cursor = conn.cursor()
     
-    try:
-        cursor.execute('''
-            SELECT s.user_id, s.current_streak, s.longest_streak, s.last_activity,
-                   u.username
-            FROM streaks s
-            JOIN users u ON s.user_id = u.id
-            WHERE s.group_id = ?
-            ORDER BY s.current_streak DESC, s.longest_streak DESC
-        ''', (group_id,))
-        
-        streaks = cursor.fetchall()
-        
-        return jsonify([{
-            'user_id': streak[0],
-            'current_streak': streak[1],
-            'longest_streak': streak[2],
-            'last_activity': streak[3],
-            'username': streak[4]
-        } for streak in streaks])
-    finally:
-        conn.close()
+    cursor.execute(SQL_GROUP_STREAKS, (group_id,))
+    
+    return with_etag(sql_json_response(cursor), etag)
 
 # Streak management
 @app.route('/api/streaks/<int:user_id>/update', methods=['POST'])
@@ -843,12 +1062,15 @@ def update_streak(user_id):
     else:
         return jsonify({'error': 'Failed to update streak'}), 500
 
-# Initialize database when the module is imported
-try:
-    init_db()
-    print("Database initialized successfully")
-except Exception as e:
-    print(f"Database initialization error: {e}")
+@app.cli.command('init-db')
+def init_db_command():
+    """Create the database tables and indexes"""
+    if init_db():
+        print("Database initialized successfully")
+    else:
+        print("Database schema is already up to date")
+
+threading.Thread(target=optimize_db_periodically, daemon=True).start()
 
 # For Vercel deployment
 if __name__ == '__main__':
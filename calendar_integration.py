@@ -4,27 +4,136 @@ Handles calendar synchronization and smart scheduling
 """
 
 import os
-import json
+import re
+import orjson
+import heapq
+import threading
+from bisect import bisect_left
+from collections import OrderedDict
+from itertools import cycle
+from operator import itemgetter
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from google.auth.transport.requests import Request
 from google.oauth2.credentials import Credentials
 from google_auth_oauthlib.flow import InstalledAppFlow
 from googleapiclient.discovery import build
+from googleapiclient.errors import HttpError
+from googleapiclient.model import JsonModel
 import requests
+import icalendar
 from typing import List, Dict, Optional
 
 # Scopes for Google Calendar API
 SCOPES = ['https://www.googleapis.com/auth/calendar.readonly', 'https://www.googleapis.com/auth/calendar.events']
 
+# Number of iCal feeds whose parsed events are kept between requests
+ICAL_CACHE_SIZE = 64
+
+# iCal feeds are read in chunks and abandoned past this size
+ICAL_MAX_BYTES = 10 * 1024 * 1024
+ICAL_CHUNK_BYTES = 64 * 1024
+
+# Google caps batch requests at 50 calls each
+GOOGLE_BATCH_SIZE = 50
+
+# A full Google sync covers this much past the requested window, so the
+# rolling "next N days" requests stay inside it and only fetch deltas
+GOOGLE_SYNC_LOOKAHEAD = timedelta(days=30)
+
+# Calendar fetches are network-bound, so feeds are downloaded side by side
+fetch_pool = ThreadPoolExecutor(max_workers=8)
+
+# Keyword groups in priority order: the first group with a match in the work
+# description decides the study type (and its duration in minutes) or subject
+STUDY_TYPE_KEYWORDS = (
+    (('pset', 'problem set', 'homework', 'assignment'), 'Problem Set', 180),
+    (('exam', 'test', 'midterm', 'final'), 'Exam Preparation', 240),
+    (('project', 'paper', 'essay', 'report'), 'Project Work', 200),
+    (('read', 'reading', 'textbook', 'chapter'), 'Reading & Notes', 90),
+    (('code', 'programming', 'debug', 'algorithm'), 'Coding Practice', 150),
+)
+
+SUBJECT_KEYWORDS = (
+    (('math', 'calculus', 'algebra', 'statistics'), 'Mathematics'),
+    (('physics', 'chemistry', 'biology', 'science'), 'Science'),
+    (('cs', 'computer science', 'programming', 'code'), 'Computer Science'),
+    (('english', 'literature', 'writing', 'essay'), 'English/Literature'),
+    (('history', 'social studies', 'politics'), 'History'),
+)
+
+def _compile_keyword_groups(keyword_groups) -> re.Pattern:
+    """Compile keyword groups into one pattern with a capture group per keyword group.
+    The lookahead tries every position, and at each one the earliest listed group wins."""
+    alternatives = ('(' + '|'.join(map(re.escape, words)) + ')' for words, *_ in keyword_groups)
+    return re.compile('(?=' + '|'.join(alternatives) + ')')
+
+STUDY_TYPE_PATTERN = _compile_keyword_groups(STUDY_TYPE_KEYWORDS)
+SUBJECT_PATTERN = _compile_keyword_groups(SUBJECT_KEYWORDS)
+
+def _match_keyword_group(pattern: re.Pattern, text: str) -> Optional[int]:
+    """Index of the highest-priority keyword group found anywhere in text, in one scan"""
+    best = None
+    for match in pattern.finditer(text):
+        group = match.lastindex - 1
+        if best is None or group < best:
+            best = group
+            if best == 0:
+                break
+    return best
+
+def parse_timestamp(value: str) -> datetime:
+    """Parse an ISO 8601 timestamp, including a trailing Z"""
+    try:
+        # The C parser accepts Z directly on Python 3.11+
+        return datetime.fromisoformat(value)
+    except ValueError:
+        return datetime.fromisoformat(value.replace('Z', '+00:00'))
+
+class OrjsonModel(JsonModel):
+    """Google API model that encodes request bodies and decodes responses with orjson"""
+    
+    def serialize(self, body_value):
+        if isinstance(body_value, dict) and 'data' not in body_value and self._data_wrapper:
+            body_value = {'data': body_value}
+        return orjson.dumps(body_value).decode()
+    
+    def deserialize(self, content):
+        try:
+            body = orjson.loads(content)
+        except orjson.JSONDecodeError:
+            return super().deserialize(content)
+        if self._data_wrapper and 'data' in body:
+            body = body['data']
+        return body
+
 class CalendarIntegration:
     def __init__(self):
         self.google_service = None
         self.credentials = None
+        # url -> (etag, last_modified, [(start, event), ...]), least recently used first
+        self._ical_cache = OrderedDict()
+        self._ical_cache_lock = threading.Lock()
+        # One Session per thread (requests.Session isn't thread-safe), so each
+        # fetch_pool worker still reuses its kept-alive connections
+        self._sessions = threading.local()
+        # calendar id -> {'token', 'time_min', 'time_max', 'events': {event id: (start, end, event)}}
+        self._google_sync = {}
+        self._google_sync_lock = threading.Lock()
         
+    @property
+    def _session(self) -> requests.Session:
+        """The calling thread's Session, created on first use"""
+        session = getattr(self._sessions, 'session', None)
+        if session is None:
+            session = self._sessions.session = requests.Session()
+        return session
+    
     def authenticate_google(self, credentials_file: str = 'credentials.json') -> bool:
         """Authenticate with Google Calendar API"""
         try:
-            if os.path.exists('token.json'):
+            # token.json is only read once per process; later calls reuse the loaded credentials
+            if self.credentials is None and os.path.exists('token.json'):
                 self.credentials = Credentials.from_authorized_user_file('token.json', SCOPES)
             
             if not self.credentials or not self.credentials.valid:
@@ -33,95 +142,172 @@ class CalendarIntegration:
                 else:
                     flow = InstalledAppFlow.from_client_secrets_file(credentials_file, SCOPES)
                     self.credentials = flow.run_local_server(port=0)
+                    self.google_service = None
                 
                 # Save credentials for next run
                 with open('token.json', 'w') as token:
                     token.write(self.credentials.to_json())
             
-            self.google_service = build('calendar', 'v3', credentials=self.credentials)
+            # A refresh updates the credentials in place, so an existing service stays usable
+            if self.google_service is None:
+                self.google_service = build('calendar', 'v3', credentials=self.credentials, model=OrjsonModel())
             return True
         except Exception as e:
             print(f"Google Calendar authentication failed: {e}")
             return False
     
-    def get_google_events(self, start_time: datetime, end_time: datetime) -> List[Dict]:
+    def _sync_google_calendar(self, calendar_id: str, state: Dict, **params):
+        """Apply every page of an events().list call to the cached events and keep its sync token"""
+        request = self.google_service.events().list(calendarId=calendar_id, singleEvents=True, **params)
+        while request is not None:
+            result = request.execute()
+            for event in result.get('items', []):
+                if event.get('status') == 'cancelled':
+                    state['events'].pop(event['id'], None)
+                    continue
+                
+                start = event['start'].get('dateTime', event['start'].get('date'))
+                end = event['end'].get('dateTime', event['end'].get('date'))
+                state['events'][event['id']] = (
+                    self._to_local_datetime(parse_timestamp(start)),
+                    self._to_local_datetime(parse_timestamp(end)),
+                    {
+                        'title': event.get('summary', 'No Title'),
+                        'start': start,
+                        'end': end,
+                        'description': event.get('description', ''),
+                        'source': 'google'
+                    }
+                )
+            state['token'] = result.get('nextSyncToken', state['token'])
+            request = self.google_service.events().list_next(request, result)
+    
+    def get_google_events(self, start_time: datetime, end_time: datetime, calendar_id: str = 'primary') -> List[Dict]:
         """Fetch events from Google Calendar"""
         if not self.google_service:
             return []
         
         try:
-            events_result = self.google_service.events().list(
-                calendarId='primary',
-                timeMin=start_time.isoformat() + 'Z',
-                timeMax=end_time.isoformat() + 'Z',
-                singleEvents=True,
-                orderBy='startTime'
-            ).execute()
+            with self._google_sync_lock:
+                state = self._google_sync.get(calendar_id)
+                
+                # Inside the synced window only the changes since the last call are fetched
+                if (state and state['token'] and state['time_min'] <= start_time
+                        and end_time <= state['time_max']):
+                    try:
+                        self._sync_google_calendar(calendar_id, state, syncToken=state['token'])
+                    except HttpError as e:
+                        # 410 Gone means the token expired and a full sync is required
+                        if e.resp.status != 410:
+                            raise
+                        state = None
+                else:
+                    state = None
+                
+                if state is None:
+                    time_max = end_time + GOOGLE_SYNC_LOOKAHEAD
+                    state = {'token': None, 'time_min': start_time, 'time_max': time_max, 'events': {}}
+                    self._sync_google_calendar(
+                        calendar_id, state,
+                        timeMin=start_time.isoformat() + 'Z',
+                        timeMax=time_max.isoformat() + 'Z'
+                    )
+                    self._google_sync[calendar_id] = state
+                
+                events = [(event_start, event) for event_start, event_end, event in state['events'].values()
+                          if event_start < end_time and event_end > start_time]
             
-            events = events_result.get('items', [])
-            return [{
-                'title': event.get('summary', 'No Title'),
-                'start': event['start'].get('dateTime', event['start'].get('date')),
-                'end': event['end'].get('dateTime', event['end'].get('date')),
-                'description': event.get('description', ''),
-                'source': 'google'
-            } for event in events]
+            events.sort(key=lambda item: item[0])
+            return [dict(event) for _, event in events]
         except Exception as e:
             print(f"Error fetching Google Calendar events: {e}")
             return []
     
+    @staticmethod
+    def _to_local_datetime(value) -> datetime:
+        """Normalize an iCal date or datetime to a naive local datetime"""
+        if not isinstance(value, datetime):
+            return datetime.combine(value, datetime.min.time())
+        if value.tzinfo is not None:
+            return value.astimezone().replace(tzinfo=None)
+        return value
+    
+    def _parse_ical_events(self, content: bytes) -> List[tuple]:
+        """Parse an iCal document into (start, event) pairs"""
+        # icalendar handles line folding, VALUE=DATE and TZID parameters
+        ical = icalendar.Calendar.from_ical(content)
+        
+        events = []
+        for component in ical.walk('VEVENT'):
+            if 'DTSTART' not in component:
+                continue
+            try:
+                event_start = self._to_local_datetime(component.decoded('DTSTART'))
+                event = {'start': event_start.isoformat(), 'source': 'ical'}
+                if 'DTEND' in component:
+                    event['end'] = self._to_local_datetime(component.decoded('DTEND')).isoformat()
+                elif 'DURATION' in component:
+                    event['end'] = (event_start + component.decoded('DURATION')).isoformat()
+            except (ValueError, TypeError):
+                continue
+            
+            if 'SUMMARY' in component:
+                event['title'] = str(component['SUMMARY'])
+            if 'DESCRIPTION' in component:
+                event['description'] = str(component['DESCRIPTION'])
+            events.append((event_start, event))
+        
+        return events
+    
     def parse_ical_url(self, ical_url: str, start_time: datetime, end_time: datetime) -> List[Dict]:
         """Parse iCal URL and extract events"""
         try:
-            response = requests.get(ical_url, timeout=10)
-            response.raise_for_status()
+            with self._ical_cache_lock:
+                cached = self._ical_cache.get(ical_url)
             
-            # Simple iCal parsing - in production, use icalendar library
-            events = []
-            lines = response.text.split('\n')
-            current_event = {}
+            # Revalidate the cached copy so an unchanged feed costs a 304 and no parsing
+            headers = {}
+            if cached:
+                etag, last_modified, _ = cached
+                if etag:
+                    headers['If-None-Match'] = etag
+                if last_modified:
+                    headers['If-Modified-Since'] = last_modified
             
-            for line in lines:
-                line = line.strip()
-                if line == 'BEGIN:VEVENT':
-                    current_event = {}
-                elif line == 'END:VEVENT':
-                    if current_event:
-                        events.append(current_event)
-                    current_event = {}
-                elif line.startswith('SUMMARY:'):
-                    current_event['title'] = line[8:]
-                elif line.startswith('DTSTART:'):
-                    current_event['start'] = line[8:]
-                elif line.startswith('DTEND:'):
-                    current_event['end'] = line[6:]
-                elif line.startswith('DESCRIPTION:'):
-                    current_event['description'] = line[12:]
+            # Streamed so a 304 never reads a body and oversized feeds are cut off
+            # before they are buffered; the context manager returns the connection
+            with self._session.get(ical_url, headers=headers, timeout=10, stream=True) as response:
+                if cached and response.status_code == 304:
+                    events = cached[2]
+                else:
+                    response.raise_for_status()
+                    body = bytearray()
+                    for chunk in response.iter_content(ICAL_CHUNK_BYTES):
+                        body += chunk
+                        if len(body) > ICAL_MAX_BYTES:
+                            raise ValueError(f"iCal feed exceeds {ICAL_MAX_BYTES} bytes")
+                    
+                    # icalendar needs the whole document, since VTIMEZONE definitions
+                    # and folded lines can span chunk boundaries
+                    events = self._parse_ical_events(bytes(body))
+                    cached = (response.headers.get('ETag'), response.headers.get('Last-Modified'), events)
             
-            # Filter events by date range
-            filtered_events = []
-            for event in events:
-                if 'start' in event:
-                    try:
-                        event_start = datetime.fromisoformat(event['start'].replace('Z', '+00:00'))
-                        if start_time <= event_start <= end_time:
-                            event['source'] = 'ical'
-                            filtered_events.append(event)
-                    except:
-                        continue
+            with self._ical_cache_lock:
+                self._ical_cache[ical_url] = cached
+                self._ical_cache.move_to_end(ical_url)
+                while len(self._ical_cache) > ICAL_CACHE_SIZE:
+                    self._ical_cache.popitem(last=False)
             
-            return filtered_events
+            return [dict(event) for event_start, event in events
+                    if start_time <= event_start <= end_time]
         except Exception as e:
             print(f"Error parsing iCal URL: {e}")
             return []
     
-    def create_google_event(self, title: str, description: str, start_time: datetime, 
-                           end_time: datetime, calendar_id: str = 'primary') -> Dict:
-        """Create an event in Google Calendar"""
-        if not self.google_service:
-            raise Exception("Google Calendar not authenticated")
-        
-        event = {
+    @staticmethod
+    def _study_event_body(title: str, description: str, start_time: datetime, end_time: datetime) -> Dict:
+        """Build the Google Calendar resource for a study session"""
+        return {
             'summary': title,
             'description': description,
             'start': {
@@ -141,6 +327,26 @@ class CalendarIntegration:
             },
             'colorId': '2',  # Green color for study sessions
         }
+    
+    @staticmethod
+    def _created_event_summary(created_event: Dict) -> Dict:
+        """Reduce an inserted Google Calendar event to the fields the app returns"""
+        return {
+            'id': created_event['id'],
+            'title': created_event['summary'],
+            'start': created_event['start']['dateTime'],
+            'end': created_event['end']['dateTime'],
+            'htmlLink': created_event.get('htmlLink', ''),
+            'source': 'google'
+        }
+    
+    def create_google_event(self, title: str, description: str, start_time: datetime, 
+                           end_time: datetime, calendar_id: str = 'primary') -> Dict:
+        """Create an event in Google Calendar"""
+        if not self.google_service:
+            raise Exception("Google Calendar not authenticated")
+        
+        event = self._study_event_body(title, description, start_time, end_time)
         
         try:
             created_event = self.google_service.events().insert(
@@ -148,31 +354,61 @@ class CalendarIntegration:
                 body=event
             ).execute()
             
-            return {
-                'id': created_event['id'],
-                'title': created_event['summary'],
-                'start': created_event['start']['dateTime'],
-                'end': created_event['end']['dateTime'],
-                'htmlLink': created_event.get('htmlLink', ''),
-                'source': 'google'
-            }
+            return self._created_event_summary(created_event)
         except Exception as e:
             raise Exception(f"Failed to create Google Calendar event: {e}")
     
+    def create_google_events_batch(self, events: List[Dict], calendar_id: str = 'primary') -> List[Optional[Dict]]:
+        """Create several events in Google Calendar, one HTTP request per GOOGLE_BATCH_SIZE events.
+        Each event needs title, description, start_time and end_time. Results are in input
+        order, with None for any event Google rejected."""
+        if not self.google_service:
+            raise Exception("Google Calendar not authenticated")
+        
+        results = [None] * len(events)
+        
+        def on_insert(request_id, response, exception):
+            if exception is not None:
+                print(f"Failed to create Google Calendar event: {exception}")
+            else:
+                results[int(request_id)] = self._created_event_summary(response)
+        
+        try:
+            for offset in range(0, len(events), GOOGLE_BATCH_SIZE):
+                batch = self.google_service.new_batch_http_request(callback=on_insert)
+                for i, event in enumerate(events[offset:offset + GOOGLE_BATCH_SIZE], offset):
+                    body = self._study_event_body(event['title'], event.get('description', ''),
+                                                  event['start_time'], event['end_time'])
+                    batch.add(self.google_service.events().insert(calendarId=calendar_id, body=body),
+                              request_id=str(i))
+                batch.execute()
+        except Exception as e:
+            raise Exception(f"Failed to create Google Calendar events: {e}")
+        
+        return results
+    
     def get_all_events(self, ical_urls: List[str], start_time: datetime, end_time: datetime) -> List[Dict]:
         """Get events from all connected calendars"""
-        all_events = []
+        # Fetch Google Calendar and every iCal feed concurrently
+        futures = [fetch_pool.submit(self.get_google_events, start_time, end_time)]
+        futures += [fetch_pool.submit(self.parse_ical_url, ical_url, start_time, end_time)
+                    for ical_url in ical_urls]
         
-        # Get Google Calendar events
-        google_events = self.get_google_events(start_time, end_time)
-        all_events.extend(google_events)
+        # Collect in submission order so the merged list is stable
+        all_events = []
+        for future in futures:
+            all_events.extend(future.result())
         
-        # Get iCal events
-        for ical_url in ical_urls:
-            ical_events = self.parse_ical_url(ical_url, start_time, end_time)
-            all_events.extend(ical_events)
+        # Drop events that show up in more than one feed
+        seen = set()
+        unique_events = []
+        for event in all_events:
+            key = (event.get('title'), event.get('start'), event.get('end'))
+            if key not in seen:
+                seen.add(key)
+                unique_events.append(event)
         
-        return all_events
+        return unique_events
 
 class SmartScheduler:
     def __init__(self, calendar_integration: CalendarIntegration):
@@ -198,12 +434,26 @@ class SmartScheduler:
         busy_times = []
         for event in existing_events:
             try:
-                event_start = datetime.fromisoformat(event['start'].replace('Z', '+00:00'))
-                event_end = datetime.fromisoformat(event['end'].replace('Z', '+00:00'))
-                busy_times.append((event_start, event_end))
+                event_start = parse_timestamp(event['start'])
+                event_end = parse_timestamp(event['end'])
+                busy_times.append((CalendarIntegration._to_local_datetime(event_start),
+                                   CalendarIntegration._to_local_datetime(event_end)))
             except:
                 continue
         
+        # Merge overlapping events into disjoint sorted intervals so each slot
+        # only has to be checked against one neighbour found by bisect
+        # The merged intervals are kept as parallel start and end lists
+        busy_times.sort()
+        busy_starts = []
+        busy_ends = []
+        for busy_start, busy_end in busy_times:
+            if busy_ends and busy_start <= busy_ends[-1]:
+                busy_ends[-1] = max(busy_ends[-1], busy_end)
+            else:
+                busy_starts.append(busy_start)
+                busy_ends.append(busy_end)
+        
         # Get preferred study times from user preferences
         preferred_hours = user_preferences.get('preferred_study_hours', [9, 14, 19])
         preferred_days = user_preferences.get('preferred_days', [0, 1, 2, 3, 4])  # Monday-Friday
@@ -211,36 +461,51 @@ class SmartScheduler:
         # Find available slots
         available_slots = []
         
-        for day_offset in range(days_ahead):
-            current_date = start_time + timedelta(days=day_offset)
+        # Scores and subjects only depend on the hour and weekday, so each pair is rated once
+        slot_ratings = {}
+        
+        # Build slots from each day's midnight plus precomputed offsets instead of
+        # rebuilding every datetime field by field
+        preferred_weekdays = set(preferred_days)
+        hour_offsets = [(hour, timedelta(hours=hour)) for hour in preferred_hours]
+        slot_length = timedelta(minutes=study_duration)
+        one_day = timedelta(days=1)
+        day_start = start_time.replace(hour=0, minute=0, second=0, microsecond=0) - one_day
+        
+        for _ in range(days_ahead):
+            day_start += one_day
             
             # Skip if not a preferred day
-            if current_date.weekday() not in preferred_days:
+            if day_start.weekday() not in preferred_weekdays:
                 continue
             
-            for hour in preferred_hours:
-                slot_start = current_date.replace(hour=hour, minute=0, second=0, microsecond=0)
-                slot_end = slot_start + timedelta(minutes=study_duration)
+            for hour, hour_offset in hour_offsets:
+                slot_start = day_start + hour_offset
+                slot_end = slot_start + slot_length
                 
-                # Check if this slot conflicts with existing events
-                conflicts = False
-                for busy_start, busy_end in busy_times:
-                    if (slot_start < busy_end and slot_end > busy_start):
-                        conflicts = True
-                        break
+                # Conflicts if the last interval starting before the slot ends is still running at its start
+                i = bisect_left(busy_starts, slot_end)
+                conflicts = i > 0 and busy_ends[i - 1] > slot_start
                 
                 if not conflicts:
+                    rating_key = (hour, slot_start.weekday())
+                    if rating_key not in slot_ratings:
+                        slot_ratings[rating_key] = (
+                            self._calculate_confidence_score(slot_start, user_preferences),
+                            self._suggest_subject(slot_start, user_preferences)
+                        )
+                    confidence_score, subject = slot_ratings[rating_key]
+                    
                     available_slots.append({
                         'start_time': slot_start.isoformat(),
                         'end_time': slot_end.isoformat(),
                         'duration_minutes': study_duration,
-                        'confidence_score': self._calculate_confidence_score(slot_start, user_preferences),
-                        'subject': self._suggest_subject(slot_start, user_preferences)
+                        'confidence_score': confidence_score,
+                        'subject': subject
                     })
         
-        # Sort by confidence score and return top recommendations
-        available_slots.sort(key=lambda x: x['confidence_score'], reverse=True)
-        return available_slots[:10]  # Return top 10 recommendations
+        # Return the top 10 recommendations by confidence score without sorting every slot
+        return heapq.nlargest(10, available_slots, key=itemgetter('confidence_score'))
     
     def _calculate_confidence_score(self, slot_time: datetime, preferences: Dict) -> float:
         """Calculate confidence score for a study slot based on user preferences"""
@@ -284,53 +549,43 @@ class SmartScheduler:
         study_type = "General Study"
         duration = 120  # Default 2 hours
         
-        if any(word in work_lower for word in ['pset', 'problem set', 'homework', 'assignment']):
-            study_type = "Problem Set"
-            duration = 180  # 3 hours for problem sets
-        elif any(word in work_lower for word in ['exam', 'test', 'midterm', 'final']):
-            study_type = "Exam Preparation"
-            duration = 240  # 4 hours for exams
-        elif any(word in work_lower for word in ['project', 'paper', 'essay', 'report']):
-            study_type = "Project Work"
-            duration = 200  # 3.5 hours for projects
-        elif any(word in work_lower for word in ['read', 'reading', 'textbook', 'chapter']):
-            study_type = "Reading & Notes"
-            duration = 90   # 1.5 hours for reading
-        elif any(word in work_lower for word in ['code', 'programming', 'debug', 'algorithm']):
-            study_type = "Coding Practice"
-            duration = 150  # 2.5 hours for coding
+        group = _match_keyword_group(STUDY_TYPE_PATTERN, work_lower)
+        if group is not None:
+            _, study_type, duration = STUDY_TYPE_KEYWORDS[group]
         
         # Extract subject from work description
         subject = "General"
-        if any(word in work_lower for word in ['math', 'calculus', 'algebra', 'statistics']):
-            subject = "Mathematics"
-        elif any(word in work_lower for word in ['physics', 'chemistry', 'biology', 'science']):
-            subject = "Science"
-        elif any(word in work_lower for word in ['cs', 'computer science', 'programming', 'code']):
-            subject = "Computer Science"
-        elif any(word in work_lower for word in ['english', 'literature', 'writing', 'essay']):
-            subject = "English/Literature"
-        elif any(word in work_lower for word in ['history', 'social studies', 'politics']):
-            subject = "History"
+        
+        group = _match_keyword_group(SUBJECT_PATTERN, work_lower)
+        if group is not None:
+            _, subject = SUBJECT_KEYWORDS[group]
         
         # Generate study sessions based on work complexity
         sessions = []
         preferred_hours = preferences.get('preferred_study_hours', [9, 14, 19])
+        description = f"Study session for: {work_description}"
+        
+        # Every session starts on the hour, so build them from today's midnight
+        today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
         
         # For complex work, suggest multiple sessions
         if duration > 180:
             # Split into multiple sessions
             session_duration = 120
+            session_length = timedelta(minutes=session_duration)
             num_sessions = max(2, duration // session_duration)
             
-            for i in range(num_sessions):
-                hour = preferred_hours[i % len(preferred_hours)]
-                start_time = datetime.now().replace(hour=hour, minute=0, second=0, microsecond=0) + timedelta(days=i)
-                end_time = start_time + timedelta(minutes=session_duration)
+            # One session a day, cycling through the preferred hours
+            one_day = timedelta(days=1)
+            day_start = today
+            for i, hour in zip(range(num_sessions), cycle(preferred_hours)):
+                start_time = day_start + timedelta(hours=hour)
+                day_start += one_day
+                end_time = start_time + session_length
                 
                 sessions.append({
                     'title': f"{study_type} - {subject} (Part {i+1})",
-                    'description': f"Study session for: {work_description}",
+                    'description': description,
                     'start_time': start_time.isoformat(),
                     'end_time': end_time.isoformat(),
                     'duration_minutes': session_duration,
@@ -340,13 +595,12 @@ class SmartScheduler:
                 })
         else:
             # Single session
-            hour = preferred_hours[0]
-            start_time = datetime.now().replace(hour=hour, minute=0, second=0, microsecond=0)
+            start_time = today + timedelta(hours=preferred_hours[0])
             end_time = start_time + timedelta(minutes=duration)
             
             sessions.append({
                 'title': f"{study_type} - {subject}",
-                'description': f"Study session for: {work_description}",
+                'description': description,
                 'start_time': start_time.isoformat(),
                 'end_time': end_time.isoformat(),
                 'duration_minutes': duration,
@@ -5,325 +5,371 @@ Handles user dashboard, streak tracking, and social features
 
 import sqlite3
 import json
+import queue
+import time
+from bisect import bisect_right
+from contextlib import contextmanager
 from datetime import datetime, timedelta
-from typing import List, Dict, Optional
+from typing import Callable, List, Dict, Optional, Tuple
 import calendar
+from operator import itemgetter
 
-class DashboardManager:
-    def __init__(self, db_path: str = 'accountability.db'):
-        self.db_path = db_path
+# WAL-safe tuning applied to every connection: non-blocking readers, fsync only
+# at checkpoint time, a 64 MiB page cache and a 256 MiB memory map
+SQLITE_PRAGMAS = (
+    'PRAGMA journal_mode=WAL',
+    'PRAGMA synchronous=NORMAL',
+    'PRAGMA temp_store=MEMORY',
+    'PRAGMA mmap_size=268435456',
+    'PRAGMA cache_size=-65536',
+    'PRAGMA busy_timeout=5000',
+)
+
+# Large enough that the driver never evicts one of the hot statements
+SQLITE_CACHED_STATEMENTS = 256
+
+# Connections kept open per pool; matches the web server's worker threads
+POOL_SIZE = 8
+
+# Leaderboards only change when a streak is updated; this bounds staleness
+# from writers in other processes
+LEADERBOARD_TTL_SECONDS = 30
+
+# Recent sessions are paged by keyset on (created_at, id); the first page
+# starts after every real row
+RECENT_SESSIONS_PAGE_SIZE = 10
+RECENT_SESSIONS_START = ('9999-12-31', 0)
+
+# Milestone rewards as (threshold, message), sorted by threshold so the earned
+# prefix can be sliced off with a bisect
+STREAK_REWARDS = (
+    (7, "🔥 7-day streak! You're building momentum!"),
+    (21, "🌟 21-day streak! This is becoming a habit!"),
+    (30, "💪 30-day streak! You're unstoppable!"),
+)
+DAY_REWARDS = (
+    (50, "🎯 50 days! You're almost at the finish line!"),
+)
+HABIT_FORMED_REWARD = "🏆 Congratulations! You've formed a lasting habit!"
+
+class ConnectionPool:
+    """Fixed-size pool of SQLite connections reused across calls and threads"""
     
-    def get_user_dashboard(self, user_id: int) -> Dict:
-        """Get comprehensive dashboard data for a user"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
+    def __init__(self, connect: Callable[[], sqlite3.Connection], size: int = POOL_SIZE):
+        self._connect = connect
+        # Slots start empty and are opened on first use
+        self._idle = queue.LifoQueue(maxsize=size)
+        for _ in range(size):
+            self._idle.put(None)
+    
+    @contextmanager
+    def connection(self):
+        """Borrow a connection, waiting if every one is in use"""
+        conn = self._idle.get()
         try:
-            # Get user info
-            cursor.execute('SELECT * FROM users WHERE id = ?', (user_id,))
-            user = cursor.fetchone()
-            if not user:
-                return {'error': 'User not found'}
-            
-            # Get current streaks
-            cursor.execute('''
-                SELECT s.*, g.name as group_name
+            if conn is None:
+                conn = self._connect()
+            yield conn
+        finally:
+            # Never hand the next caller someone else's open transaction
+            if conn is not None and conn.in_transaction:
+                conn.rollback()
+            self._idle.put(conn)
+
+def connect_tuned(db_path: str) -> sqlite3.Connection:
+    """Open a poolable connection to db_path (a path or SQLite URI) with the tuned pragmas applied"""
+    conn = sqlite3.connect(db_path, cached_statements=SQLITE_CACHED_STATEMENTS,
+                           check_same_thread=False, uri=True)
+    for pragma in SQLITE_PRAGMAS:
+        conn.execute(pragma)
+    return conn
+
+def default_pool(db_path: str) -> ConnectionPool:
+    """Pool of tuned connections to db_path"""
+    return ConnectionPool(lambda: connect_tuned(db_path))
+
+class DashboardManager:
+    # Builds every dashboard panel as one JSON document in a single statement;
+    # totals and streaks come from the trigger-maintained user_stats row
+    DASHBOARD_QUERY = '''
+        SELECT json_object(
+            'user', json_object(
+                'id', u.id,
+                'username', u.username,
+                'email', u.email,
+                'preferences', json(COALESCE(NULLIF(u.preferences, ''), '{}'))
+            ),
+            'streaks', (
+                SELECT json_group_array(json_object(
+                    'id', s.id,
+                    'user_id', s.user_id,
+                    'group_id', s.group_id,
+                    'current_streak', s.current_streak,
+                    'longest_streak', s.longest_streak,
+                    'last_activity', s.last_activity,
+                    'group_name', g.name
+                ))
                 FROM streaks s
                 LEFT JOIN groups g ON s.group_id = g.id
-                WHERE s.user_id = ?
-            ''', (user_id,))
-            streaks = cursor.fetchall()
-            
-            # Get recent study sessions
-            cursor.execute('''
-                SELECT * FROM study_sessions 
-                WHERE user_id = ? 
-                ORDER BY created_at DESC 
-                LIMIT 10
-            ''', (user_id,))
-            recent_sessions = cursor.fetchall()
-            
-            # Get groups user belongs to
-            cursor.execute('''
-                SELECT g.*, gm.joined_at
+                WHERE s.user_id = u.id
+            ),
+            'recent_sessions', (
+                SELECT json_group_array(json_object(
+                    'id', id,
+                    'user_id', user_id,
+                    'start_time', start_time,
+                    'end_time', end_time,
+                    'subject', subject,
+                    'completed', json(CASE WHEN completed THEN 'true' ELSE 'false' END),
+                    'created_at', created_at
+                ))
+                FROM (
+                    SELECT id, user_id, start_time, end_time, subject, completed, created_at
+                    FROM study_sessions
+                    WHERE user_id = u.id
+                      AND (created_at, id) < (:before, :before_id)
+                    ORDER BY created_at DESC, id DESC
+                    LIMIT :page_size
+                )
+            ),
+            'groups', (
+                SELECT json_group_array(json_object(
+                    'id', g.id,
+                    'name', g.name,
+                    'description', g.description,
+                    'created_by', g.created_by,
+                    'created_at', g.created_at,
+                    'joined_at', gm.joined_at
+                ))
                 FROM groups g
                 JOIN group_members gm ON g.id = gm.group_id
-                WHERE gm.user_id = ?
-            ''', (user_id,))
-            user_groups = cursor.fetchall()
-            
-            # Calculate statistics
-            stats = self._calculate_user_stats(cursor, user_id)
+                WHERE gm.user_id = u.id
+            ),
+            'statistics', json_object(
+                'total_sessions', COALESCE(us.total_sessions, 0),
+                'completed_sessions', COALESCE(us.completed_sessions, 0),
+                'completion_rate', COALESCE(100.0 * us.completed_sessions / NULLIF(us.total_sessions, 0), 0),
+                'this_week_sessions', (
+                    SELECT COUNT(*) FROM study_sessions
+                    WHERE user_id = u.id AND created_at >= :week_ago
+                ),
+                'current_streak', COALESCE(us.current_streak, 0),
+                'longest_streak', COALESCE(us.longest_streak, 0)
+            )
+        )
+        FROM users u
+        LEFT JOIN user_stats us ON us.user_id = u.id
+        WHERE u.id = :user_id
+    '''
+    
+    UPSERT_STREAK_QUERY = '''
+        INSERT INTO streaks (user_id, group_id, current_streak, longest_streak, last_activity)
+        VALUES (?, ?, 1, 1, ?)
+        ON CONFLICT (user_id, IFNULL(group_id, -1)) DO UPDATE SET
+            current_streak = current_streak + 1,
+            longest_streak = MAX(longest_streak, current_streak + 1),
+            last_activity = excluded.last_activity
+    '''
+    
+    # Bins every session from the window into its week in one pass. Weeks are
+    # rolling seven-day windows counted back from now (to the second): week k
+    # holds [now - 7(k+1) days, now - 7k days), and the - 1 keeps a session at
+    # exactly a window's start in that window. Bounds and bins both read the
+    # integer created_epoch from idx_ss_user_epoch, so no row's date string is
+    # parsed; created_at is naive, so now_epoch comes from timegm to match
+    WEEKLY_PROGRESS_QUERY = '''
+        SELECT (:now_epoch - 1 - created_epoch) / 604800 AS week_offset,
+               COUNT(*),
+               COALESCE(SUM(completed = 1), 0),
+               COALESCE(100.0 * SUM(completed = 1) / COUNT(*), 0)
+        FROM study_sessions
+        WHERE user_id = :user_id
+          AND created_epoch >= :since_epoch
+          AND created_epoch < :now_epoch
+        GROUP BY week_offset
+    '''
+    
+    def __init__(self, db_path: str = 'accountability.db', pool: Optional[ConnectionPool] = None):
+        self.db_path = db_path
+        self.pool = pool or default_pool(db_path)
+        # group_id -> (computed_at, leaderboard)
+        self._leaderboard_cache = {}
+    
+    def get_user_dashboard_json(self, user_id: int,
+                                before: Tuple[str, int] = RECENT_SESSIONS_START) -> str:
+        """Get comprehensive dashboard data for a user as a JSON string.
+        recent_sessions holds the page of sessions older than the (created_at, id) in before."""
+        with self.pool.connection() as conn:
+            week_ago = datetime.now() - timedelta(days=7)
+            row = conn.execute(self.DASHBOARD_QUERY, {
+                'user_id': user_id,
+                'week_ago': week_ago.isoformat(' '),
+                'before': before[0],
+                'before_id': before[1],
+                'page_size': RECENT_SESSIONS_PAGE_SIZE
+            }).fetchone()
+            if not row:
+                return json.dumps({'error': 'User not found'})
             
-            return {
-                'user': {
-                    'id': user[0],
-                    'username': user[1],
-                    'email': user[2],
-                    'preferences': json.loads(user[3]) if user[3] else {}
-                },
-                'streaks': [{
-                    'id': streak[0],
-                    'user_id': streak[1],
-                    'group_id': streak[2],
-                    'current_streak': streak[3],
-                    'longest_streak': streak[4],
-                    'last_activity': streak[5],
-                    'group_name': streak[7]
-                } for streak in streaks],
-                'recent_sessions': [{
-                    'id': session[0],
-                    'user_id': session[1],
-                    'start_time': session[2],
-                    'end_time': session[3],
-                    'subject': session[4],
-                    'completed': bool(session[5]),
-                    'created_at': session[6]
-                } for session in recent_sessions],
-                'groups': [{
-                    'id': group[0],
-                    'name': group[1],
-                    'description': group[2],
-                    'created_by': group[3],
-                    'created_at': group[4],
-                    'joined_at': group[5]
-                } for group in user_groups],
-                'statistics': stats
-            }
-        finally:
-            conn.close()
+            return row[0]
     
-    def _calculate_user_stats(self, cursor, user_id: int) -> Dict:
-        """Calculate user statistics"""
-        # Total study sessions
-        cursor.execute('SELECT COUNT(*) FROM study_sessions WHERE user_id = ?', (user_id,))
-        total_sessions = cursor.fetchone()[0]
-        
-        # Completed sessions
-        cursor.execute('SELECT COUNT(*) FROM study_sessions WHERE user_id = ? AND completed = 1', (user_id,))
-        completed_sessions = cursor.fetchone()[0]
-        
-        # This week's sessions
-        week_ago = datetime.now() - timedelta(days=7)
-        cursor.execute('''
-            SELECT COUNT(*) FROM study_sessions 
-            WHERE user_id = ? AND created_at >= ?
-        ''', (user_id, week_ago.isoformat()))
-        this_week_sessions = cursor.fetchone()[0]
-        
-        # Current streak
-        cursor.execute('''
-            SELECT current_streak FROM streaks 
-            WHERE user_id = ? 
-            ORDER BY current_streak DESC 
-            LIMIT 1
-        ''', (user_id,))
-        current_streak = cursor.fetchone()
-        current_streak = current_streak[0] if current_streak else 0
-        
-        # Longest streak
-        cursor.execute('''
-            SELECT longest_streak FROM streaks 
-            WHERE user_id = ? 
-            ORDER BY longest_streak DESC 
-            LIMIT 1
-        ''', (user_id,))
-        longest_streak = cursor.fetchone()
-        longest_streak = longest_streak[0] if longest_streak else 0
-        
-        return {
-            'total_sessions': total_sessions,
-            'completed_sessions': completed_sessions,
-            'completion_rate': (completed_sessions / total_sessions * 100) if total_sessions > 0 else 0,
-            'this_week_sessions': this_week_sessions,
-            'current_streak': current_streak,
-            'longest_streak': longest_streak
-        }
+    def get_user_dashboard(self, user_id: int) -> Dict:
+        """Get comprehensive dashboard data for a user"""
+        return json.loads(self.get_user_dashboard_json(user_id))
     
-    def update_streak(self, user_id: int, group_id: Optional[int] = None) -> bool:
-        """Update user's streak after completing a study session"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+    def update_streak(self, user_id: int, group_id: Optional[int] = None,
+                      conn: Optional[sqlite3.Connection] = None) -> bool:
+        """Update user's streak after completing a study session.
+        Pass an open connection to join the caller's transaction instead of committing;
+        the caller must then call invalidate_leaderboard once that transaction commits."""
+        if conn is None:
+            with self.pool.connection() as conn:
+                try:
+                    self._upsert_streak(conn, user_id, group_id)
+                    conn.commit()
+                    # Only after the commit, or a concurrent read could
+                    # re-cache the old rows for a full TTL
+                    self.invalidate_leaderboard(group_id)
+                    return True
+                except Exception as e:
+                    print(f"Error updating streak: {e}")
+                    return False
         
-        try:
-            # Check if streak exists
-            cursor.execute('''
-                SELECT id, current_streak, longest_streak 
-                FROM streaks 
-                WHERE user_id = ? AND group_id = ?
-            ''', (user_id, group_id))
-            
-            streak = cursor.fetchone()
-            now = datetime.now().isoformat()
-            
-            if streak:
-                # Update existing streak
-                new_streak = streak[1] + 1
-                new_longest = max(streak[2], new_streak)
-                
-                cursor.execute('''
-                    UPDATE streaks 
-                    SET current_streak = ?, longest_streak = ?, last_activity = ?
-                    WHERE id = ?
-                ''', (new_streak, new_longest, now, streak[0]))
-            else:
-                # Create new streak
-                cursor.execute('''
-                    INSERT INTO streaks (user_id, group_id, current_streak, longest_streak, last_activity)
-                    VALUES (?, ?, 1, 1, ?)
-                ''', (user_id, group_id, now))
-            
-            conn.commit()
-            return True
-        except Exception as e:
-            print(f"Error updating streak: {e}")
-            return False
-        finally:
-            conn.close()
+        # Let errors propagate so the caller's transaction rolls back
+        self._upsert_streak(conn, user_id, group_id)
+        return True
+    
+    def invalidate_leaderboard(self, group_id: Optional[int]):
+        """Drop the cached leaderboard for a group whose streaks just committed"""
+        self._leaderboard_cache.pop(group_id, None)
+    
+    @staticmethod
+    def _upsert_streak(conn: sqlite3.Connection, user_id: int, group_id: Optional[int]):
+        """Start a new streak or extend the existing one in a single statement"""
+        conn.execute(DashboardManager.UPSERT_STREAK_QUERY,
+                     (user_id, group_id, datetime.now().isoformat()))
     
     def get_group_leaderboard(self, group_id: int) -> List[Dict]:
         """Get leaderboard for a group"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+        cached = self._leaderboard_cache.get(group_id)
+        if cached and time.monotonic() - cached[0] < LEADERBOARD_TTL_SECONDS:
+            return cached[1]
         
-        try:
+        with self.pool.connection() as conn:
+            cursor = conn.cursor()
+            cursor.row_factory = sqlite3.Row
+            
             cursor.execute('''
-                SELECT u.username, s.current_streak, s.longest_streak, s.last_activity
+                SELECT u.username, s.current_streak, s.longest_streak, s.last_activity,
+                       ROW_NUMBER() OVER (ORDER BY s.current_streak DESC, s.longest_streak DESC) AS rank
                 FROM streaks s
                 JOIN users u ON s.user_id = u.id
                 WHERE s.group_id = ?
-                ORDER BY s.current_streak DESC, s.longest_streak DESC
+                ORDER BY rank
             ''', (group_id,))
             
-            leaderboard = cursor.fetchall()
+            leaderboard = [dict(row) for row in cursor.fetchall()]
             
-            return [{
-                'username': row[0],
-                'current_streak': row[1],
-                'longest_streak': row[2],
-                'last_activity': row[3],
-                'rank': i + 1
-            } for i, row in enumerate(leaderboard)]
-        finally:
-            conn.close()
+            self._leaderboard_cache[group_id] = (time.monotonic(), leaderboard)
+            return leaderboard
     
     def get_weekly_progress(self, user_id: int, weeks: int = 4) -> List[Dict]:
         """Get weekly progress data for the last N weeks"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        try:
-            weekly_data = []
+        with self.pool.connection() as conn:
+            # Whole seconds, so the range bounds and the epoch bins agree
+            now = datetime.now().replace(microsecond=0)
+            now_epoch = calendar.timegm(now.timetuple())
+            rows = conn.execute(self.WEEKLY_PROGRESS_QUERY, {
+                'user_id': user_id,
+                'now_epoch': now_epoch,
+                'since_epoch': now_epoch - weeks * 604800
+            }).fetchall()
             
-            for week_offset in range(weeks):
-                week_start = datetime.now() - timedelta(weeks=week_offset + 1)
-                week_end = week_start + timedelta(days=7)
-                
-                # Get sessions for this week
-                cursor.execute('''
-                    SELECT COUNT(*), SUM(CASE WHEN completed = 1 THEN 1 ELSE 0 END)
-                    FROM study_sessions 
-                    WHERE user_id = ? AND created_at >= ? AND created_at < ?
-                ''', (user_id, week_start.isoformat(), week_end.isoformat()))
-                
-                result = cursor.fetchone()
-                total_sessions = result[0] or 0
-                completed_sessions = result[1] or 0
+            # Weeks without sessions have no row and report zeros
+            counts = [(0, 0, 0)] * weeks
+            for week_offset, total_sessions, completed_sessions, completion_rate in rows:
+                if 0 <= week_offset < weeks:
+                    counts[week_offset] = (total_sessions, completed_sessions, completion_rate)
+            
+            weekly_data = []
+            for week_offset in reversed(range(weeks)):  # Chronological order
+                week_start = now - timedelta(weeks=week_offset + 1)
+                total_sessions, completed_sessions, completion_rate = counts[week_offset]
                 
                 weekly_data.append({
                     'week': week_start.strftime('%Y-%m-%d'),
                     'total_sessions': total_sessions,
                     'completed_sessions': completed_sessions,
-                    'completion_rate': (completed_sessions / total_sessions * 100) if total_sessions > 0 else 0
+                    'completion_rate': completion_rate
                 })
             
-            return list(reversed(weekly_data))  # Return in chronological order
-        finally:
-            conn.close()
+            return weekly_data
     
     def create_study_challenge(self, group_id: int, challenge_data: Dict) -> bool:
         """Create a study challenge for a group"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        try:
-            # Create challenges table if it doesn't exist
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS challenges (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    group_id INTEGER,
-                    title TEXT NOT NULL,
-                    description TEXT,
-                    target_streak INTEGER,
-                    start_date TIMESTAMP,
-                    end_date TIMESTAMP,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    FOREIGN KEY (group_id) REFERENCES groups (id)
-                )
-            ''')
-            
-            cursor.execute('''
-                INSERT INTO challenges (group_id, title, description, target_streak, start_date, end_date)
-                VALUES (?, ?, ?, ?, ?, ?)
-            ''', (
-                group_id,
-                challenge_data['title'],
-                challenge_data.get('description', ''),
-                challenge_data['target_streak'],
-                challenge_data['start_date'],
-                challenge_data['end_date']
-            ))
+        with self.pool.connection() as conn:
+            cursor = conn.cursor()
             
-            conn.commit()
-            return True
-        except Exception as e:
-            print(f"Error creating challenge: {e}")
-            return False
-        finally:
-            conn.close()
+            try:
+                # Create challenges table if it doesn't exist
+                cursor.execute('''
+                    CREATE TABLE IF NOT EXISTS challenges (
+                        id INTEGER PRIMARY KEY AUTOINCREMENT,
+                        group_id INTEGER,
+                        title TEXT NOT NULL,
+                        description TEXT,
+                        target_streak INTEGER,
+                        start_date TIMESTAMP,
+                        end_date TIMESTAMP,
+                        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                        FOREIGN KEY (group_id) REFERENCES groups (id)
+                    )
+                ''')
+                
+                cursor.execute('''
+                    INSERT INTO challenges (group_id, title, description, target_streak, start_date, end_date)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                ''', (
+                    group_id,
+                    challenge_data['title'],
+                    challenge_data.get('description', ''),
+                    challenge_data['target_streak'],
+                    challenge_data['start_date'],
+                    challenge_data['end_date']
+                ))
+                
+                conn.commit()
+                return True
+            except Exception as e:
+                print(f"Error creating challenge: {e}")
+                return False
 
 class HabitTracker:
-    def __init__(self, db_path: str = 'accountability.db'):
+    # Length of the latest run of consecutive days with a completed session:
+    # days in one run share julianday(day) - row number
+    CURRENT_STREAK_QUERY = '''
+        WITH days AS (
+            SELECT DISTINCT date(created_at) AS day
+            FROM study_sessions
+            WHERE user_id = ? AND completed = 1
+        ),
+        runs AS (
+            SELECT day, julianday(day) - ROW_NUMBER() OVER (ORDER BY day) AS run
+            FROM days
+        )
+        SELECT COUNT(*) FROM runs
+        WHERE run = (SELECT run FROM runs ORDER BY day DESC LIMIT 1)
+    '''
+    
+    def __init__(self, db_path: str = 'accountability.db', pool: Optional[ConnectionPool] = None):
         self.db_path = db_path
+        self.pool = pool or default_pool(db_path)
         self.habit_formation_days = 70  # Target for habit formation
     
     def track_habit_progress(self, user_id: int) -> Dict:
         """Track progress towards habit formation"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        try:
-            # Get user's study sessions
-            cursor.execute('''
-                SELECT created_at, completed 
-                FROM study_sessions 
-                WHERE user_id = ? 
-                ORDER BY created_at ASC
-            ''', (user_id,))
-            
-            sessions = cursor.fetchall()
-            
-            if not sessions:
-                return {
-                    'days_completed': 0,
-                    'days_remaining': self.habit_formation_days,
-                    'progress_percentage': 0,
-                    'current_streak': 0,
-                    'is_on_track': False
-                }
-            
-            # Calculate consecutive days
-            current_streak = 0
-            last_date = None
-            
-            for session in sessions:
-                session_date = datetime.fromisoformat(session[0]).date()
-                if session[1]:  # If completed
-                    if last_date is None or session_date == last_date + timedelta(days=1):
-                        current_streak += 1
-                    elif session_date != last_date:
-                        current_streak = 1
-                    last_date = session_date
+        with self.pool.connection() as conn:
+            current_streak = conn.execute(self.CURRENT_STREAK_QUERY, (user_id,)).fetchone()[0]
             
             days_completed = min(current_streak, self.habit_formation_days)
             days_remaining = max(0, self.habit_formation_days - days_completed)
@@ -337,27 +383,17 @@ class HabitTracker:
                 'is_on_track': current_streak >= 5,  # Consider on track if 5+ day streak
                 'milestone_reached': days_completed >= self.habit_formation_days
             }
-        finally:
-            conn.close()
     
     def get_milestone_rewards(self, progress: Dict) -> List[str]:
         """Get milestone rewards based on progress"""
-        rewards = []
-        
-        if progress['current_streak'] >= 7:
-            rewards.append("🔥 7-day streak! You're building momentum!")
-        
-        if progress['current_streak'] >= 21:
-            rewards.append("🌟 21-day streak! This is becoming a habit!")
-        
-        if progress['current_streak'] >= 30:
-            rewards.append("💪 30-day streak! You're unstoppable!")
-        
-        if progress['days_completed'] >= 50:
-            rewards.append("🎯 50 days! You're almost at the finish line!")
+        threshold = itemgetter(0)
+        rewards = [message for _, message in
+                   STREAK_REWARDS[:bisect_right(STREAK_REWARDS, progress['current_streak'], key=threshold)]]
+        rewards += [message for _, message in
+                    DAY_REWARDS[:bisect_right(DAY_REWARDS, progress['days_completed'], key=threshold)]]
         
         if progress['milestone_reached']:
-            rewards.append("🏆 Congratulations! You've formed a lasting habit!")
+            rewards.append(HABIT_FORMED_REWARD)
         
         return rewards
 
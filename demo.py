@@ -5,7 +5,7 @@ Demonstrates key features of the accountability tool
 """
 
 import requests
-import json
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 
 # Base URL for the API
@@ -15,6 +15,11 @@ def demo_studystreak():
     """Run a comprehensive demo of StudyStreak features"""
     print("🔥 StudyStreak Demo - Building Productive Habits Together! 🔥\n")
     
+    # One keep-alive connection pool for the sequential calls instead of a new
+    # connection per request; requests.Session isn't thread-safe, so the
+    # independent calls issued together below each make a plain request
+    client = requests.Session()
+    
     # 1. Create a user
     print("1. Creating a new user...")
     user_data = {
@@ -29,7 +34,7 @@ def demo_studystreak():
     }
     
     try:
-        response = requests.post(f"{BASE_URL}/api/users", json=user_data)
+        response = client.post(f"{BASE_URL}/api/users", json=user_data)
         if response.status_code == 201:
             user = response.json()
             print(f"✅ User created: {user['username']} (ID: {user['id']})")
@@ -49,7 +54,7 @@ def demo_studystreak():
         "created_by": user_id
     }
     
-    response = requests.post(f"{BASE_URL}/api/groups", json=group_data)
+    response = client.post(f"{BASE_URL}/api/groups", json=group_data)
     if response.status_code == 201:
         group = response.json()
         print(f"✅ Group created: {group['name']} (ID: {group['id']})")
@@ -58,9 +63,18 @@ def demo_studystreak():
         print(f"❌ Failed to create group: {response.text}")
         return
     
+    # Group listing and schedule recommendations don't depend on each other
+    schedule_data = {
+        "user_id": user_id,
+        "preferences": {}
+    }
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        groups_future = pool.submit(requests.get, f"{BASE_URL}/api/groups")
+        recommend_future = pool.submit(requests.post, f"{BASE_URL}/api/schedule/recommend", json=schedule_data)
+    
     # 2.5. Test getting all groups
     print("\n2.5. Testing group listing...")
-    response = requests.get(f"{BASE_URL}/api/groups")
+    response = groups_future.result()
     if response.status_code == 200:
         groups = response.json()
         print(f"✅ Found {len(groups)} groups available")
@@ -71,12 +85,7 @@ def demo_studystreak():
     
     # 3. Get smart schedule recommendations
     print("\n3. Getting smart schedule recommendations...")
-    schedule_data = {
-        "user_id": user_id,
-        "preferences": {}
-    }
-    
-    response = requests.post(f"{BASE_URL}/api/schedule/recommend", json=schedule_data)
+    response = recommend_future.result()
     if response.status_code == 200:
         recommendations = response.json()
         print(f"✅ Found {len(recommendations['recommended_sessions'])} study time recommendations:")
@@ -102,27 +111,33 @@ def demo_studystreak():
             "subject": subject
         }
         
-        response = requests.post(f"{BASE_URL}/api/study-sessions", json=session_data)
+        response = client.post(f"{BASE_URL}/api/study-sessions", json=session_data)
         if response.status_code == 201:
             session = response.json()
             print(f"✅ Created {subject} session (ID: {session['id']})")
             
             # Complete the session
-            complete_response = requests.put(f"{BASE_URL}/api/study-sessions/{session['id']}/complete")
+            complete_response = client.put(f"{BASE_URL}/api/study-sessions/{session['id']}/complete")
             if complete_response.status_code == 200:
                 print(f"   ✅ Completed {subject} session")
                 
                 # Update streak
                 streak_data = {"group_id": group_id}
-                streak_response = requests.post(f"{BASE_URL}/api/streaks/{user_id}/update", json=streak_data)
+                streak_response = client.post(f"{BASE_URL}/api/streaks/{user_id}/update", json=streak_data)
                 if streak_response.status_code == 200:
                     print(f"   🔥 Streak updated!")
         else:
             print(f"❌ Failed to create {subject} session: {response.text}")
     
+    # Dashboard, habit progress and leaderboard are independent reads
+    with ThreadPoolExecutor(max_workers=3) as pool:
+        dashboard_future = pool.submit(requests.get, f"{BASE_URL}/api/dashboard/{user_id}")
+        habit_future = pool.submit(requests.get, f"{BASE_URL}/api/dashboard/{user_id}/habit-progress")
+        leaderboard_future = pool.submit(requests.get, f"{BASE_URL}/api/groups/{group_id}/leaderboard")
+    
     # 5. Get dashboard data
     print("\n5. Getting dashboard data...")
-    response = requests.get(f"{BASE_URL}/api/dashboard/{user_id}")
+    response = dashboard_future.result()
     if response.status_code == 200:
         dashboard = response.json()
         print("✅ Dashboard data retrieved:")
@@ -135,7 +150,7 @@ def demo_studystreak():
     
     # 6. Get habit progress
     print("\n6. Checking habit formation progress...")
-    response = requests.get(f"{BASE_URL}/api/dashboard/{user_id}/habit-progress")
+    response = habit_future.result()
     if response.status_code == 200:
         habit_data = response.json()
         progress = habit_data['progress']
@@ -156,7 +171,7 @@ def demo_studystreak():
     
     # 7. Get group leaderboard
     print("\n7. Getting group leaderboard...")
-    response = requests.get(f"{BASE_URL}/api/groups/{group_id}/leaderboard")
+    response = leaderboard_future.result()
     if response.status_code == 200:
         leaderboard = response.json()
         print("✅ Group leaderboard:")
@@ -1,44 +1,91 @@
 #!/usr/bin/env python3
 """
 Database migration script for Schoova
-Adds password_hash column to existing users table
+Brings databases created by older versions up to the current schema
 """
 
 import sqlite3
 import os
 
-def migrate_database():
-    """Migrate the database to add password_hash column"""
-    db_path = 'accountability.db'
-    
+from schema import SCHEMA_VERSION, create_schema, schema_version
+
+# Columns added to study_sessions after the table was first created
+STUDY_SESSION_COLUMNS = [
+    ('title', 'TEXT'),
+    ('description', 'TEXT'),
+    ('duration_minutes', 'INTEGER'),
+    ('location', 'TEXT'),
+    ('notes', 'TEXT'),
+    ('completed_at', 'TIMESTAMP')
+]
+
+# VACUUM afterwards only when at least this share of the file is free pages
+VACUUM_FREE_RATIO = 0.25
+
+def migrate_database(db_path='accountability.db'):
+    """Migrate the database to add missing columns, tables, indexes and triggers"""
     if not os.path.exists(db_path):
-        print("Database doesn't exist. Run the app first to create it.")
+        print("Database doesn't exist. Run 'flask --app app init-db' first to create it.")
         return
     
     conn = sqlite3.connect(db_path)
     cursor = conn.cursor()
     
+    # journal_mode can't change inside a transaction, so set it first
+    cursor.execute('PRAGMA journal_mode=WAL')
+    
     try:
+        # Take the write lock up front so every step lands in one commit
+        # (the driver would otherwise run each ALTER TABLE in autocommit)
+        cursor.execute('BEGIN IMMEDIATE')
+        migrated = False
+        
         # Check if password_hash column already exists
         cursor.execute("PRAGMA table_info(users)")
         columns = [column[1] for column in cursor.fetchall()]
         
-        if 'password_hash' in columns:
-            print("password_hash column already exists. No migration needed.")
-            return
+        if 'password_hash' not in columns:
+            print("Adding password_hash column to users table...")
+            
+            # Existing users read the default placeholder hash (they'll need to
+            # reset); SQLite serves it from the schema without rewriting any rows
+            cursor.execute("ALTER TABLE users ADD COLUMN password_hash TEXT NOT NULL DEFAULT 'default:needs_reset'")
+            print("Note: Existing users will need to reset their passwords.")
+            migrated = True
         
-        print("Adding password_hash column to users table...")
+        # Check which study_sessions columns are missing
+        cursor.execute("PRAGMA table_info(study_sessions)")
+        columns = [column[1] for column in cursor.fetchall()]
         
-        # Add the password_hash column
-        cursor.execute('ALTER TABLE users ADD COLUMN password_hash TEXT')
+        for col_name, col_type in STUDY_SESSION_COLUMNS:
+            if col_name not in columns:
+                print(f"Adding {col_name} column to study_sessions table...")
+                cursor.execute(f'ALTER TABLE study_sessions ADD COLUMN {col_name} {col_type}')
+                migrated = True
         
-        # Update existing users with a default password hash (they'll need to reset)
-        cursor.execute('UPDATE users SET password_hash = ? WHERE password_hash IS NULL', 
-                      ('default:needs_reset',))
+        # Everything else (the streak dedupe and unique index, user_stats with
+        # its backfill and triggers) is the shared schema DDL, committed
+        # together with the columns added above
+        if schema_version(conn) < SCHEMA_VERSION:
+            print("Bringing tables, indexes and triggers up to date...")
+            create_schema(cursor)
+            migrated = True
+        
+        if not migrated:
+            conn.rollback()
+            print("Schema is up to date. No migration needed.")
+            return
         
         conn.commit()
         print("✅ Database migration completed successfully!")
-        print("Note: Existing users will need to reset their passwords.")
+        
+        # Reclaim space freed by the migration, but skip the full rewrite
+        # unless the file is mostly empty pages
+        page_count = cursor.execute('PRAGMA page_count').fetchone()[0]
+        freelist_count = cursor.execute('PRAGMA freelist_count').fetchone()[0]
+        if page_count and freelist_count / page_count >= VACUUM_FREE_RATIO:
+            print("Compacting database...")
+            cursor.execute('VACUUM')
         
     except Exception as e:
         print(f"❌ Migration failed: {e}")
@@ -0,0 +1,251 @@
+"""
+Database schema for StudyStreak
+Shared by app.py (flask --app app init-db) and migrate_db.py; importing it has
+no side effects, the caller supplies the connection
+"""
+
+import sqlite3
+
+# Stamped in PRAGMA user_version; bump whenever create_schema gains tables,
+# indexes or triggers so init_db reruns it on older databases
+SCHEMA_VERSION = 2
+
+def schema_version(conn: sqlite3.Connection) -> int:
+    """The SCHEMA_VERSION a database was last brought up to (0 if never)"""
+    return conn.execute('PRAGMA user_version').fetchone()[0]
+
+def init_db(conn: sqlite3.Connection) -> bool:
+    """Bring the database up to SCHEMA_VERSION in one transaction.
+    Returns False if it was already current. Safe to run from several
+    processes at once: the write lock is taken before the version is read,
+    so whoever waited on it sees the finished schema and does nothing."""
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        if schema_version(conn) >= SCHEMA_VERSION:
+            conn.rollback()
+            return False
+        create_schema(conn.cursor())
+        conn.commit()
+        return True
+    except Exception:
+        conn.rollback()
+        raise
+
+def create_schema(cursor: sqlite3.Cursor):
+    """Create every table, index and trigger and stamp SCHEMA_VERSION. Each
+    statement is idempotent, so this also upgrades older databases; it runs
+    inside the caller's transaction and does not commit."""
+    # Users table
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS users (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            username TEXT UNIQUE NOT NULL,
+            email TEXT UNIQUE NOT NULL,
+            preferences TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            password_hash TEXT
+        )
+    ''')
+    
+    # Groups table
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS groups (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            description TEXT,
+            created_by INTEGER,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (created_by) REFERENCES users (id)
+        )
+    ''')
+    
+    # Group members table
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS group_members (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            group_id INTEGER,
+            user_id INTEGER,
+            joined_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (group_id) REFERENCES groups (id),
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        )
+    ''')
+    
+    # Study sessions table
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS study_sessions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER,
+            start_time TIMESTAMP,
+            end_time TIMESTAMP,
+            subject TEXT,
+            completed BOOLEAN DEFAULT FALSE,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            title TEXT,
+            description TEXT,
+            duration_minutes INTEGER,
+            location TEXT,
+            notes TEXT,
+            completed_at TIMESTAMP,
+            created_epoch INTEGER,
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        )
+    ''')
+    
+    # created_at as integer seconds (read as UTC, like strftime('%s')), so
+    # weekly progress bins without parsing a date string per row. The triggers
+    # parse each row once on write; older databases gain the column and are
+    # backfilled here
+    cursor.execute('PRAGMA table_info(study_sessions)')
+    if 'created_epoch' not in [column[1] for column in cursor.fetchall()]:
+        cursor.execute('ALTER TABLE study_sessions ADD COLUMN created_epoch INTEGER')
+    cursor.execute('''
+        UPDATE study_sessions SET created_epoch = CAST(strftime('%s', created_at) AS INTEGER)
+        WHERE created_epoch IS NULL
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_ss_created_epoch_insert
+        AFTER INSERT ON study_sessions
+        BEGIN
+            UPDATE study_sessions SET created_epoch = CAST(strftime('%s', NEW.created_at) AS INTEGER)
+            WHERE id = NEW.id;
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_ss_created_epoch_update
+        AFTER UPDATE OF created_at ON study_sessions
+        BEGIN
+            UPDATE study_sessions SET created_epoch = CAST(strftime('%s', NEW.created_at) AS INTEGER)
+            WHERE id = NEW.id;
+        END
+    ''')
+    
+    # Streaks table
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS streaks (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER,
+            group_id INTEGER,
+            current_streak INTEGER DEFAULT 0,
+            longest_streak INTEGER DEFAULT 0,
+            last_activity TIMESTAMP,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES users (id),
+            FOREIGN KEY (group_id) REFERENCES groups (id)
+        )
+    ''')
+    
+    # Accomplishments table
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS accomplishments (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER,
+            group_id INTEGER,
+            title TEXT NOT NULL,
+            description TEXT,
+            category TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES users (id),
+            FOREIGN KEY (group_id) REFERENCES groups (id)
+        )
+    ''')
+    
+    # Indexes for the hot lookup/sort paths (users.email is already
+    # indexed by its UNIQUE constraint)
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_ss_user_time ON study_sessions(user_id, start_time DESC)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_ss_user_created ON study_sessions(user_id, created_at)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_ss_user_completed_created ON study_sessions(user_id, completed, created_at)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_ss_user_epoch ON study_sessions(user_id, created_epoch, completed)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_acc_group_time ON accomplishments(group_id, created_at DESC)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_streaks_group ON streaks(group_id, current_streak DESC, longest_streak DESC)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_gm_group ON group_members(group_id)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_gm_user ON group_members(user_id)')
+    
+    # One streak per user per group; update_streak upserts against this.
+    # NULLs never collide in a UNIQUE index, so personal (group-less) streaks
+    # are keyed on IFNULL(group_id, -1); older databases drop the plain-column
+    # index and keep only the latest streak row per user and group
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = 'uq_streaks_user_group_key'")
+    if cursor.fetchone() is None:
+        cursor.execute('DROP INDEX IF EXISTS uq_streaks_user_group')
+        cursor.execute('''
+            DELETE FROM streaks
+            WHERE id NOT IN (SELECT MAX(id) FROM streaks GROUP BY user_id, IFNULL(group_id, -1))
+        ''')
+        cursor.execute('CREATE UNIQUE INDEX IF NOT EXISTS uq_streaks_user_group_key ON streaks(user_id, IFNULL(group_id, -1))')
+    
+    # Per-user dashboard totals, kept current by the triggers below
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'user_stats'")
+    backfill_user_stats = cursor.fetchone() is None
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS user_stats (
+            user_id INTEGER PRIMARY KEY,
+            total_sessions INTEGER NOT NULL DEFAULT 0,
+            completed_sessions INTEGER NOT NULL DEFAULT 0,
+            current_streak INTEGER NOT NULL DEFAULT 0,
+            longest_streak INTEGER NOT NULL DEFAULT 0
+        )
+    ''')
+    
+    if backfill_user_stats:
+        cursor.execute('''
+            INSERT INTO user_stats (user_id, total_sessions, completed_sessions, current_streak, longest_streak)
+            SELECT u.id,
+                   (SELECT COUNT(*) FROM study_sessions WHERE user_id = u.id),
+                   (SELECT COUNT(*) FROM study_sessions WHERE user_id = u.id AND completed = 1),
+                   (SELECT COALESCE(MAX(current_streak), 0) FROM streaks WHERE user_id = u.id),
+                   (SELECT COALESCE(MAX(longest_streak), 0) FROM streaks WHERE user_id = u.id)
+            FROM users u
+        ''')
+    
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_user_stats_session_insert
+        AFTER INSERT ON study_sessions
+        BEGIN
+            INSERT INTO user_stats (user_id, total_sessions, completed_sessions)
+            VALUES (NEW.user_id, 1, COALESCE(NEW.completed = 1, 0))
+            ON CONFLICT (user_id) DO UPDATE SET
+                total_sessions = total_sessions + 1,
+                completed_sessions = completed_sessions + excluded.completed_sessions;
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_user_stats_session_update
+        AFTER UPDATE OF user_id, completed ON study_sessions
+        BEGIN
+            UPDATE user_stats SET
+                total_sessions = total_sessions - 1,
+                completed_sessions = completed_sessions - COALESCE(OLD.completed = 1, 0)
+            WHERE user_id = OLD.user_id;
+            INSERT INTO user_stats (user_id, total_sessions, completed_sessions)
+            VALUES (NEW.user_id, 1, COALESCE(NEW.completed = 1, 0))
+            ON CONFLICT (user_id) DO UPDATE SET
+                total_sessions = total_sessions + 1,
+                completed_sessions = completed_sessions + excluded.completed_sessions;
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_user_stats_session_delete
+        AFTER DELETE ON study_sessions
+        BEGIN
+            UPDATE user_stats SET
+                total_sessions = total_sessions - 1,
+                completed_sessions = completed_sessions - COALESCE(OLD.completed = 1, 0)
+            WHERE user_id = OLD.user_id;
+        END
+    ''')
+    for event in ('INSERT', 'UPDATE'):
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS trg_user_stats_streak_{event.lower()}
+            AFTER {event} ON streaks
+            BEGIN
+                INSERT INTO user_stats (user_id, current_streak, longest_streak)
+                SELECT NEW.user_id, MAX(current_streak), MAX(longest_streak)
+                FROM streaks WHERE user_id = NEW.user_id
+                ON CONFLICT (user_id) DO UPDATE SET
+                    current_streak = excluded.current_streak,
+                    longest_streak = excluded.longest_streak;
+            END
+        ''')
+    
+    cursor.execute(f'PRAGMA user_version = {SCHEMA_VERSION}')
@@ -2,146 +2,299 @@
 Test suite for StudyStreak application
 """
 
-import pytest
-import json
+import os
+import sys
 import sqlite3
+import subprocess
+import threading
+import hashlib
+import pytest
+import orjson
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-from app import app, init_db
 
-@pytest.fixture
-def client():
-    """Create test client"""
-    app.config['TESTING'] = True
+# Run against a shared in-memory database instead of accountability.db; it is
+# named per process so pytest-xdist workers (pytest -n auto) stay isolated
+os.environ['STUDYSTREAK_DB_URL'] = f'file:studystreak_test_{os.getpid()}?mode=memory&cache=shared'
+
+from app import app, init_db, get_conn, compute_habit_progress, dashboard_manager
+from calendar_integration import CalendarIntegration, SmartScheduler
+from migrate_db import migrate_database
+import schema
+
+app.config['TESTING'] = True
+app.config['PROPAGATE_EXCEPTIONS'] = True
+
+# Fixed two-hour study session window shared by the session tests
+SESSION_START = datetime(2025, 1, 1, 9, 0, 0).isoformat()
+SESSION_END = datetime(2025, 1, 1, 11, 0, 0).isoformat()
+
+# Request bodies shared by several tests, serialized once
+TEST_USER = orjson.dumps({
+    'username': 'testuser',
+    'email': 'test@example.com',
+    'preferences': {}
+})
+MATH_SESSION = orjson.dumps({
+    'user_id': 1,
+    'start_time': SESSION_START,
+    'end_time': SESSION_END,
+    'subject': 'Mathematics'
+})
+ALPHA_GROUP = orjson.dumps({
+    'name': 'Study Group Alpha',
+    'description': 'A test study group',
+    'created_by': 1
+})
+SCHEDULE_REQUEST = orjson.dumps({
+    'user_id': 1,
+    'preferences': {}
+})
+JOIN_USER_2 = orjson.dumps({'user_id': 2})
+CLEAR_ICAL_URLS = orjson.dumps({'ical_urls': []})
+EMPTY_BODY = orjson.dumps({})
+LOGIN_REQUEST = orjson.dumps({'email': 'test@example.com', 'password': 'correct horse'})
+WRONG_PASSWORD_LOGIN = orjson.dumps({'email': 'test@example.com', 'password': 'wrong'})
+UNKNOWN_EMAIL_LOGIN = orjson.dumps({'email': 'nobody@example.com', 'password': 'correct horse'})
+
+@pytest.fixture(scope="session")
+def test_db():
+    """Create the schema once; yields a connection that keeps the database alive"""
+    # A shared in-memory database only lives while some connection is open
+    keeper = get_conn()
+    init_db()
+    yield keeper
+    keeper.close()
+
+@pytest.fixture(scope="session")
+def client(test_db):
+    """Create one test client shared by every test"""
     with app.test_client() as client:
         yield client
 
 @pytest.fixture
-def init_test_db():
-    """Initialize test database"""
-    init_db()
+def reset_db(test_db, client):
+    """Empty every table (and the AUTOINCREMENT counters) before a test"""
+    # Ids restart at 1, so nothing keyed by an old id may survive either
+    compute_habit_progress.cache_clear()
+    dashboard_manager._leaderboard_cache.clear()
+    with client.session_transaction() as sess:
+        sess.clear()
+    tables = [row[0] for row in test_db.execute(
+        "SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%'")]
+    for table in tables:
+        test_db.execute(f'DELETE FROM {table}')
+    test_db.execute('DELETE FROM sqlite_sequence')
+    test_db.commit()
 
-def test_create_user(client, init_test_db):
-    """Test user creation"""
-    user_data = {
-        'username': 'testuser',
-        'email': 'test@example.com',
+@pytest.fixture
+def fast_bcrypt(monkeypatch):
+    """Hash new passwords at the minimum bcrypt cost so login tests stay quick"""
+    monkeypatch.setattr('app.BCRYPT_ROUNDS', 4)
+
+@pytest.fixture
+def legacy_user(reset_db, test_db):
+    """Seed user 1 with a pre-bcrypt salt:sha256 password hash"""
+    salt = 'pepper'
+    digest = hashlib.sha256(('correct horse' + salt).encode()).hexdigest()
+    test_db.execute(
+        'INSERT INTO users (username, email, password_hash, preferences) VALUES (?, ?, ?, ?)',
+        ('testuser', 'test@example.com', f'{salt}:{digest}', '{}'))
+    test_db.commit()
+
+def stored_password_hash(user_id):
+    conn = get_conn()
+    row = conn.execute('SELECT password_hash FROM users WHERE id = ?', (user_id,)).fetchone()
+    conn.close()
+    return row[0]
+
+@pytest.fixture
+def seeded(reset_db, test_db):
+    """Seed users 1-2 and group 1 (created by user 1) directly, skipping the API"""
+    test_db.executemany(
+        'INSERT INTO users (username, email, password_hash, preferences) VALUES (?, ?, ?, ?)',
+        [('testuser', 'test@example.com', 'default:needs_reset', '{}'),
+         ('testuser2', 'test2@example.com', 'default:needs_reset', '{}')])
+    test_db.execute('INSERT INTO groups (name, description, created_by) VALUES (?, ?, ?)',
+                    ('Study Group Alpha', 'A test study group', 1))
+    test_db.execute('INSERT INTO group_members (group_id, user_id) VALUES (1, 1)')
+    test_db.commit()
+
+@pytest.mark.parametrize('endpoint,payload,expected', [
+    ('/api/users', orjson.dumps({
+        'username': 'testuser3',
+        'email': 'test3@example.com',
         'preferences': {
             'preferred_study_hours': [9, 14, 19],
             'morning_preference': 0.8
         }
-    }
-    
-    response = client.post('/api/users', 
-                          data=json.dumps(user_data),
-                          content_type='application/json')
-    
-    assert response.status_code == 201
-    data = json.loads(response.data)
-    assert data['username'] == 'testuser'
-    assert data['email'] == 'test@example.com'
-
-def test_create_group(client, init_test_db):
-    """Test group creation"""
-    # First create a user
-    user_data = {
-        'username': 'testuser',
-        'email': 'test@example.com',
-        'preferences': {}
-    }
-    client.post('/api/users', 
-                data=json.dumps(user_data),
-                content_type='application/json')
-    
-    # Create a group
-    group_data = {
-        'name': 'Study Group Alpha',
-        'description': 'A test study group',
-        'created_by': 1
-    }
-    
-    response = client.post('/api/groups',
-                          data=json.dumps(group_data),
-                          content_type='application/json')
-    
-    assert response.status_code == 201
-    data = json.loads(response.data)
-    assert data['name'] == 'Study Group Alpha'
-
-def test_create_study_session(client, init_test_db):
-    """Test study session creation"""
-    # First create a user
-    user_data = {
-        'username': 'testuser',
-        'email': 'test@example.com',
-        'preferences': {}
-    }
-    client.post('/api/users', 
-                data=json.dumps(user_data),
-                content_type='application/json')
-    
-    # Create a study session
-    session_data = {
-        'user_id': 1,
-        'start_time': datetime.now().isoformat(),
-        'end_time': (datetime.now() + timedelta(hours=2)).isoformat(),
-        'subject': 'Mathematics'
-    }
-    
-    response = client.post('/api/study-sessions',
-                          data=json.dumps(session_data),
+    }), {'username': 'testuser3', 'email': 'test3@example.com'}),
+    ('/api/groups', ALPHA_GROUP, {'name': 'Study Group Alpha'}),
+    ('/api/study-sessions', MATH_SESSION, {'subject': 'Mathematics'}),
+], ids=['user', 'group', 'study_session'])
+def test_create(client, seeded, endpoint, payload, expected):
+    """Test user, group and study session creation"""
+    response = client.post(endpoint,
+                          data=payload,
                           content_type='application/json')
     
     assert response.status_code == 201
-    data = json.loads(response.data)
-    assert data['subject'] == 'Mathematics'
+    data = response.get_json()
+    for field, value in expected.items():
+        assert data[field] == value
 
-def test_complete_study_session(client, init_test_db):
+def test_complete_study_session(client, seeded):
     """Test completing a study session"""
-    # First create a user and session
-    user_data = {
-        'username': 'testuser',
-        'email': 'test@example.com',
-        'preferences': {}
-    }
-    client.post('/api/users', 
-                data=json.dumps(user_data),
-                content_type='application/json')
-    
-    session_data = {
-        'user_id': 1,
-        'start_time': datetime.now().isoformat(),
-        'end_time': (datetime.now() + timedelta(hours=2)).isoformat(),
-        'subject': 'Mathematics'
-    }
     create_response = client.post('/api/study-sessions',
-                                 data=json.dumps(session_data),
+                                 data=MATH_SESSION,
                                  content_type='application/json')
-    session_id = json.loads(create_response.data)['id']
+    session_id = create_response.get_json()['id']
     
     # Complete the session
     response = client.put(f'/api/study-sessions/{session_id}/complete')
     assert response.status_code == 200
 
-def test_get_dashboard(client, init_test_db):
+def test_get_dashboard(client, seeded):
     """Test dashboard data retrieval"""
-    # First create a user
-    user_data = {
-        'username': 'testuser',
-        'email': 'test@example.com',
-        'preferences': {}
-    }
-    client.post('/api/users', 
-                data=json.dumps(user_data),
-                content_type='application/json')
-    
     response = client.get('/api/dashboard/1')
     assert response.status_code == 200
-    data = json.loads(response.data)
+    data = response.get_json()
     assert 'user' in data
     assert 'streaks' in data
     assert 'recent_sessions' in data
 
-def test_schedule_recommendation(client, init_test_db):
+def test_dashboard_etag(client, seeded):
+    """Test that an unchanged dashboard answers 304 and a changed one does not"""
+    response = client.get('/api/dashboard/1')
+    etag = response.headers['ETag']
+    
+    response = client.get('/api/dashboard/1', headers={'If-None-Match': etag})
+    assert response.status_code == 304
+    
+    client.post('/api/study-sessions',
+                data=MATH_SESSION,
+                content_type='application/json')
+    response = client.get('/api/dashboard/1', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+
+def test_dashboard_statistics_follow_sessions(client, seeded):
+    """Test that dashboard totals track new study sessions"""
+    response = client.get('/api/dashboard/1')
+    before = response.get_json()['statistics']['total_sessions']
+    
+    client.post('/api/study-sessions',
+                data=MATH_SESSION,
+                content_type='application/json')
+    
+    response = client.get('/api/dashboard/1')
+    data = response.get_json()
+    assert data['statistics']['total_sessions'] == before + 1
+
+def test_dashboard_statistics_follow_complete_and_delete(client, seeded):
+    """Test that the user_stats triggers track completing and deleting sessions"""
+    session_ids = [client.post('/api/study-sessions',
+                               data=MATH_SESSION,
+                               content_type='application/json').get_json()['id']
+                   for _ in range(2)]
+    
+    client.put(f'/api/study-sessions/{session_ids[0]}/complete')
+    statistics = client.get('/api/dashboard/1').get_json()['statistics']
+    assert (statistics['total_sessions'], statistics['completed_sessions']) == (2, 1)
+    
+    client.delete(f'/api/study-sessions/{session_ids[0]}')
+    statistics = client.get('/api/dashboard/1').get_json()['statistics']
+    assert (statistics['total_sessions'], statistics['completed_sessions']) == (1, 0)
+
+def test_migrate_database_builds_user_stats(tmp_path):
+    """Test that migrating a pre-user_stats database backfills it and adds the triggers"""
+    db_path = str(tmp_path / 'old.db')
+    conn = sqlite3.connect(db_path)
+    conn.executescript('''
+        CREATE TABLE users (id INTEGER PRIMARY KEY AUTOINCREMENT, username TEXT UNIQUE NOT NULL,
+                            email TEXT UNIQUE NOT NULL, preferences TEXT,
+                            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP);
+        CREATE TABLE study_sessions (id INTEGER PRIMARY KEY AUTOINCREMENT, user_id INTEGER,
+                                     start_time TIMESTAMP, end_time TIMESTAMP, subject TEXT,
+                                     completed BOOLEAN DEFAULT FALSE,
+                                     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP);
+        CREATE TABLE streaks (id INTEGER PRIMARY KEY AUTOINCREMENT, user_id INTEGER, group_id INTEGER,
+                              current_streak INTEGER DEFAULT 0, longest_streak INTEGER DEFAULT 0,
+                              last_activity TIMESTAMP, created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP);
+        INSERT INTO users (username, email) VALUES ('testuser', 'test@example.com');
+        INSERT INTO study_sessions (user_id, completed, created_at)
+        VALUES (1, 1, '2025-01-01 00:00:00'), (1, 0, '2025-01-01 00:00:00'), (1, 0, '2025-01-01 00:00:00');
+    ''')
+    conn.close()
+    
+    migrate_database(db_path)
+    
+    conn = sqlite3.connect(db_path)
+    def stats():
+        return conn.execute(
+            'SELECT total_sessions, completed_sessions FROM user_stats WHERE user_id = 1').fetchone()
+    assert stats() == (3, 1)
+    
+    conn.execute('UPDATE study_sessions SET completed = 1 WHERE id = 2')
+    conn.execute('DELETE FROM study_sessions WHERE id = 1')
+    conn.commit()
+    assert stats() == (2, 1)
+    assert conn.execute('SELECT password_hash FROM users').fetchone() == ('default:needs_reset',)
+    # created_epoch is backfilled for old rows and kept for new ones
+    conn.execute("INSERT INTO study_sessions (user_id, created_at) VALUES (1, '2025-01-08 00:00:00')")
+    assert conn.execute('SELECT DISTINCT created_epoch FROM study_sessions ORDER BY 1').fetchall() == [
+        (1735689600,), (1736294400,)]
+    conn.close()
+
+def test_init_db_concurrent_workers(tmp_path):
+    """Test that workers booting together build the schema exactly once"""
+    db_path = str(tmp_path / 'fresh.db')
+    barrier = threading.Barrier(4)
+    results = []
+    
+    def boot():
+        conn = sqlite3.connect(db_path, timeout=10)
+        conn.execute('PRAGMA journal_mode=WAL')
+        barrier.wait()
+        results.append(schema.init_db(conn))
+        conn.close()
+    
+    workers = [threading.Thread(target=boot) for _ in range(4)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    
+    assert sorted(results) == [False, False, False, True]
+    conn = sqlite3.connect(db_path)
+    assert schema.schema_version(conn) == schema.SCHEMA_VERSION
+    conn.close()
+
+def test_migrate_db_import_has_no_side_effects():
+    """Test that migrate_db.py gets the schema without importing the app"""
+    result = subprocess.run(
+        [sys.executable, '-c', "import sys, migrate_db; assert 'app' not in sys.modules"],
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    assert result.returncode == 0
+
+def test_dashboard_recent_sessions_keyset(client, seeded):
+    """Test paging recent sessions with a (created_at, id) cursor"""
+    for _ in range(2):
+        client.post('/api/study-sessions',
+                    data=MATH_SESSION,
+                    content_type='application/json')
+    
+    response = client.get('/api/dashboard/1')
+    first_page = response.get_json()['recent_sessions']
+    newest = first_page[0]
+    
+    response = client.get('/api/dashboard/1',
+                         query_string={'before': newest['created_at'], 'before_id': newest['id']})
+    next_page = response.get_json()['recent_sessions']
+    assert next_page
+    assert newest['id'] not in [s['id'] for s in next_page]
+    assert all((s['created_at'], s['id']) < (newest['created_at'], newest['id']) for s in next_page)
+
+def test_schedule_recommendation(client, reset_db):
     """Test smart schedule recommendations"""
     # First create a user
     user_data = {
@@ -153,106 +306,495 @@ def test_schedule_recommendation(client, init_test_db):
         }
     }
     client.post('/api/users', 
-                data=json.dumps(user_data),
+                data=orjson.dumps(user_data),
                 content_type='application/json')
     
     # Get schedule recommendations
-    request_data = {
-        'user_id': 1,
-        'preferences': {}
-    }
-    
     response = client.post('/api/schedule/recommend',
-                          data=json.dumps(request_data),
+                          data=SCHEDULE_REQUEST,
                           content_type='application/json')
     
     assert response.status_code == 200
-    data = json.loads(response.data)
+    data = response.get_json()
     assert 'recommended_sessions' in data
     assert len(data['recommended_sessions']) > 0
 
-def test_habit_progress(client, init_test_db):
-    """Test habit progress tracking"""
-    # First create a user
-    user_data = {
-        'username': 'testuser',
-        'email': 'test@example.com',
-        'preferences': {}
-    }
-    client.post('/api/users', 
-                data=json.dumps(user_data),
-                content_type='application/json')
+class StubCalendar:
+    """Stands in for CalendarIntegration with a fixed list of events"""
+    
+    def __init__(self, events):
+        self.events = events
+    
+    def get_all_events(self, ical_urls, start_time, end_time):
+        return self.events
+
+class FakeResponse:
+    """Minimal streamed requests.Response"""
+    
+    def __init__(self, status_code, body=b'', headers=None):
+        self.status_code = status_code
+        self.body = body
+        self.headers = headers or {}
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc_info):
+        return False
+    
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise Exception(f'HTTP {self.status_code}')
+    
+    def iter_content(self, chunk_size):
+        for i in range(0, len(self.body), chunk_size):
+            yield self.body[i:i + chunk_size]
+
+class FakeSession:
+    """Replays canned responses and records the headers each request sent"""
+    
+    def __init__(self, *responses):
+        self.responses = list(responses)
+        self.sent_headers = []
+    
+    def get(self, url, headers=None, **kwargs):
+        self.sent_headers.append(headers)
+        return self.responses.pop(0)
+
+ALL_DAY_FEED = b'''BEGIN:VCALENDAR
+VERSION:2.0
+PRODID:-//StudyStreak//Test//EN
+BEGIN:VEVENT
+UID:all-day@example.com
+DTSTART;VALUE=DATE:20250106
+DTEND;VALUE=DATE:20250107
+SUMMARY:Reading day
+END:VEVENT
+BEGIN:VEVENT
+UID:lecture@example.com
+DTSTART:20250106T090000
+DTEND:20250106T103000
+SUMMARY:Lecture
+END:VEVENT
+END:VCALENDAR
+'''
+FEED_WINDOW = (datetime(2025, 1, 1), datetime(2025, 1, 31))
+
+def nine_am_slots(busy):
+    """Recommend today's 09:00-10:00 slot around busy (start hour, end hour) pairs"""
+    today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+    events = [{'start': (today + timedelta(hours=start)).isoformat(),
+               'end': (today + timedelta(hours=end)).isoformat()}
+              for start, end in busy]
+    scheduler = SmartScheduler(StubCalendar(events))
+    return scheduler.find_optimal_study_times(
+        {'preferred_study_hours': [9], 'preferred_days': list(range(7))},
+        study_duration=60, days_ahead=1)
+
+@pytest.mark.parametrize('busy,free', [
+    ([], True),
+    # Back-to-back events only touch the slot's edges
+    ([(8, 9), (10, 11)], True),
+    ([(9.5, 10)], False),
+    # The short event starts later but the long one it overlaps still covers the slot
+    ([(7, 12), (8, 8.5)], False),
+    # Adjacent events merge into one interval that spans the slot
+    ([(7, 8), (8, 12), (8.5, 8.75)], False),
+], ids=['no_events', 'touching_boundaries', 'inside_slot', 'overlapping', 'adjacent'])
+def test_optimal_study_times_busy_intervals(busy, free):
+    """Test slot conflicts against merged busy intervals"""
+    slots = nine_am_slots(busy)
+    assert bool(slots) == free
+
+def test_parse_ical_all_day_events():
+    """Test that VALUE=DATE events start and end at local midnight"""
+    events = {event['title']: event for _, event in
+              CalendarIntegration()._parse_ical_events(ALL_DAY_FEED)}
+    assert events['Reading day']['start'] == '2025-01-06T00:00:00'
+    assert events['Reading day']['end'] == '2025-01-07T00:00:00'
+    assert events['Lecture']['start'] == '2025-01-06T09:00:00'
+
+def test_parse_ical_url_not_modified():
+    """Test that a 304 revalidation serves the cached events"""
+    calendar = CalendarIntegration()
+    calendar._sessions.session = FakeSession(
+        FakeResponse(200, ALL_DAY_FEED, {'ETag': '"v1"'}),
+        FakeResponse(304))
+    
+    first = calendar.parse_ical_url('https://example.com/cal.ics', *FEED_WINDOW)
+    second = calendar.parse_ical_url('https://example.com/cal.ics', *FEED_WINDOW)
+    
+    assert len(first) == 2
+    assert second == first
+    assert calendar._session.sent_headers == [{}, {'If-None-Match': '"v1"'}]
+
+def test_calendar_session_per_thread():
+    """Test that fetch threads never share a requests.Session"""
+    calendar = CalendarIntegration()
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        sessions = list(pool.map(lambda _: calendar._session, range(2)))
+    assert calendar._session is calendar._session
+    assert all(session is not calendar._session for session in sessions)
+
+def test_parse_ical_url_oversized_feed(monkeypatch):
+    """Test that feeds over ICAL_MAX_BYTES are dropped instead of parsed"""
+    monkeypatch.setattr('calendar_integration.ICAL_MAX_BYTES', len(ALL_DAY_FEED) - 1)
+    calendar = CalendarIntegration()
+    calendar._sessions.session = FakeSession(FakeResponse(200, ALL_DAY_FEED))
+    
+    assert calendar.parse_ical_url('https://example.com/cal.ics', *FEED_WINDOW) == []
+    assert not calendar._ical_cache
+
+class FakeGoogleService:
+    """Records batched event inserts instead of calling Google"""
+    
+    def __init__(self):
+        self.batches = []
+    
+    def events(self):
+        return self
+    
+    def insert(self, calendarId, body):
+        return body
+    
+    def new_batch_http_request(self, callback):
+        batch = FakeBatch(callback)
+        self.batches.append(batch)
+        return batch
+
+class FakeBatch:
+    def __init__(self, callback):
+        self.callback = callback
+        self.requests = []
+        self.executions = 0
+    
+    def add(self, request, request_id):
+        self.requests.append((request_id, request))
+    
+    def execute(self):
+        self.executions += 1
+        for request_id, body in self.requests:
+            self.callback(request_id, {'id': f'event{request_id}', **body}, None)
+
+def test_suggest_study_sessions_batches_calendar_events(client, seeded, test_db, monkeypatch):
+    """Test that every suggestion goes onto the calendar in one batch request"""
+    import app as studystreak
+    google_service = FakeGoogleService()
+    monkeypatch.setattr(studystreak.calendar_integration, 'google_service', google_service)
+    test_db.execute("""UPDATE users SET preferences = '{"primary_subject": "Physics"}' WHERE id = 1""")
+    test_db.commit()
     
+    response = client.post('/api/study-sessions/suggest',
+                          data=orjson.dumps({
+                              'user_id': 1,
+                              'work_description': 'Study for the calculus final exam',
+                              'add_to_calendar': True
+                          }),
+                          content_type='application/json')
+    assert response.status_code == 200
+    data = response.get_json()
+    
+    suggestions = data['suggestions']
+    assert len(suggestions) > 1
+    assert len(google_service.batches) == 1
+    assert google_service.batches[0].executions == 1
+    assert len(google_service.batches[0].requests) == len(suggestions)
+    assert [event['title'] for event in data['google_events']] == [s['title'] for s in suggestions]
+
+def test_suggest_study_sessions_unknown_user(client, reset_db):
+    """Test that suggestions for a missing user answer 404"""
+    response = client.post('/api/study-sessions/suggest',
+                          data=orjson.dumps({'user_id': 999, 'work_description': 'Reading'}),
+                          content_type='application/json')
+    assert response.status_code == 404
+
+def test_habit_progress(client, seeded):
+    """Test habit progress tracking"""
     response = client.get('/api/dashboard/1/habit-progress')
     assert response.status_code == 200
-    data = json.loads(response.data)
+    data = response.get_json()
     assert 'progress' in data
     assert 'rewards' in data
 
-def test_join_group(client, init_test_db):
+def test_habit_progress_follows_completed_sessions(client, seeded):
+    """Test that cached habit progress is refreshed when a session is completed"""
+    response = client.get('/api/dashboard/1/habit-progress')
+    assert response.get_json()['progress']['current_streak'] == 0
+    
+    create_response = client.post('/api/study-sessions',
+                                 data=MATH_SESSION,
+                                 content_type='application/json')
+    session_id = create_response.get_json()['id']
+    client.put(f'/api/study-sessions/{session_id}/complete')
+    
+    response = client.get('/api/dashboard/1/habit-progress')
+    assert response.get_json()['progress']['current_streak'] == 1
+
+def test_join_group(client, seeded):
     """Test joining a group"""
-    # First create a user and group
-    user_data = {
-        'username': 'testuser',
-        'email': 'test@example.com',
-        'preferences': {}
-    }
-    client.post('/api/users', 
-                data=json.dumps(user_data),
-                content_type='application/json')
+    # Join the group
+    response = client.post('/api/groups/1/join',
+                          data=JOIN_USER_2,
+                          content_type='application/json')
     
+    assert response.status_code == 200
+
+def test_join_group_many(client, seeded):
+    """Test adding several users to a group at once"""
     group_data = {
-        'name': 'Study Group Alpha',
-        'description': 'A test study group',
+        'name': 'Study Group Beta',
+        'description': 'A bulk-join test group',
         'created_by': 1
     }
-    client.post('/api/groups',
-                data=json.dumps(group_data),
-                content_type='application/json')
+    create_response = client.post('/api/groups',
+                                  data=orjson.dumps(group_data),
+                                  content_type='application/json')
+    group_id = create_response.get_json()['id']
     
-    # Create another user to join the group
-    user2_data = {
-        'username': 'testuser2',
-        'email': 'test2@example.com',
-        'preferences': {}
-    }
-    client.post('/api/users', 
-                data=json.dumps(user2_data),
+    join_data = {'user_ids': [1, 2]}
+    response = client.post(f'/api/groups/{group_id}/join_many',
+                          data=orjson.dumps(join_data),
+                          content_type='application/json')
+    
+    assert response.status_code == 200
+    data = response.get_json()
+    assert data['joined'] == 2
+    
+    # Missing user_ids is rejected
+    response = client.post(f'/api/groups/{group_id}/join_many',
+                          data=EMPTY_BODY,
+                          content_type='application/json')
+    assert response.status_code == 400
+
+@pytest.mark.parametrize('user_ids', [5, [], ['1'], [1, None], [True], {'1': 1}],
+                         ids=['int', 'empty', 'string_id', 'null_id', 'bool_id', 'object'])
+def test_join_group_many_rejects_bad_user_ids(client, seeded, user_ids):
+    """Test that anything but a non-empty list of integer ids is a 400"""
+    response = client.post('/api/groups/1/join_many',
+                          data=orjson.dumps({'user_ids': user_ids}),
+                          content_type='application/json')
+    assert response.status_code == 400
+
+def test_join_group_many_deduplicates(client, seeded):
+    """Test that a repeated id in one request joins only once"""
+    response = client.post('/api/groups/1/join_many',
+                          data=orjson.dumps({'user_ids': [2, 2, 2]}),
+                          content_type='application/json')
+    assert response.status_code == 200
+    assert response.get_json()['joined'] == 1
+    
+    conn = get_conn()
+    count = conn.execute('SELECT COUNT(*) FROM group_members WHERE group_id = 1 AND user_id = 2').fetchone()[0]
+    conn.close()
+    assert count == 1
+
+def test_leaderboard_follows_accomplishments(client, seeded):
+    """Test that a cached leaderboard is refreshed once an accomplishment commits"""
+    response = client.get('/api/groups/1/leaderboard')
+    assert response.get_json() == []
+    
+    client.post('/api/accomplishments',
+                data=orjson.dumps({'user_id': 1, 'group_id': 1, 'title': 'Finished pset'}),
                 content_type='application/json')
     
-    # Join the group
-    join_data = {'user_id': 2}
-    response = client.post('/api/groups/1/join',
-                          data=json.dumps(join_data),
+    response = client.get('/api/groups/1/leaderboard')
+    assert [member['username'] for member in response.get_json()] == ['testuser']
+
+def test_leaderboard_rank_order(client, seeded, test_db):
+    """Test that ranks follow current streak, then longest streak"""
+    test_db.execute("INSERT INTO users (username, email, password_hash, preferences) "
+                    "VALUES ('testuser3', 'test3@example.com', 'default:needs_reset', '{}')")
+    test_db.executemany(
+        'INSERT INTO streaks (user_id, group_id, current_streak, longest_streak) VALUES (?, 1, ?, ?)',
+        [(1, 2, 9), (2, 5, 5), (3, 2, 3)])
+    test_db.commit()
+    
+    response = client.get('/api/groups/1/leaderboard')
+    assert [(member['rank'], member['username']) for member in response.get_json()] == [
+        (1, 'testuser2'), (2, 'testuser'), (3, 'testuser3')]
+
+def test_weekly_progress_rolling_windows(client, seeded, test_db):
+    """Test that sessions either side of the seven-days-ago mark land in different weeks"""
+    boundary = datetime.now() - timedelta(weeks=1)
+    test_db.executemany(
+        'INSERT INTO study_sessions (user_id, completed, created_at) VALUES (1, ?, ?)',
+        [(1, (boundary - timedelta(minutes=5)).isoformat(' ')),
+         (0, (boundary - timedelta(minutes=5)).isoformat(' ')),
+         (1, (boundary + timedelta(minutes=5)).isoformat(' '))])
+    test_db.commit()
+    
+    response = client.get('/api/dashboard/1/weekly-progress', query_string={'weeks': 2})
+    assert [(week['total_sessions'], week['completed_sessions'])
+            for week in response.get_json()] == [(2, 1), (1, 1)]
+
+def test_update_preferences(client, seeded):
+    """Test merging keys into a user's preferences"""
+    response = client.patch('/api/users/1/preferences',
+                           data=CLEAR_ICAL_URLS,
+                           content_type='application/json')
+    assert response.status_code == 200
+    
+    response = client.get('/api/users/1')
+    data = response.get_json()
+    assert data['preferences']['ical_urls'] == []
+    
+    # ?summary=1 keeps the other preferences but drops ical_urls
+    client.patch('/api/users/1/preferences',
+                 data=orjson.dumps({'preferred_study_hours': [9, 14]}),
+                 content_type='application/json')
+    response = client.get('/api/users/1?summary=1')
+    data = response.get_json()
+    assert data['preferences'] == {'preferred_study_hours': [9, 14]}
+    
+    # Unknown users are reported as missing
+    response = client.patch('/api/users/999/preferences',
+                           data=CLEAR_ICAL_URLS,
+                           content_type='application/json')
+    assert response.status_code == 404
+
+def test_preferences_stay_out_of_cookie_session(client, reset_db):
+    """Test that preferences are not copied into a cookie-backed session"""
+    response = client.post('/api/users',
+                          data=orjson.dumps({
+                              'username': 'calendaruser',
+                              'email': 'calendar@example.com',
+                              'preferences': {'ical_urls': ['https://example.com/cal.ics'] * 100}
+                          }),
                           content_type='application/json')
+    assert response.status_code == 201
     
+    with client.session_transaction() as sess:
+        assert sess['user_id'] == response.get_json()['id']
+        assert 'preferences_json' not in sess
+
+def test_calendar_events_with_empty_preferences(client, seeded, test_db):
+    """Test that an empty preferences string reads as no calendar feeds"""
+    test_db.execute("UPDATE users SET preferences = '' WHERE id = 1")
+    test_db.commit()
+    
+    response = client.get('/api/calendar/events', query_string={
+        'user_id': 1,
+        'start_date': SESSION_START,
+        'end_date': SESSION_END
+    })
     assert response.status_code == 200
+    assert response.get_json() == []
 
-def test_duplicate_user_creation(client, init_test_db):
-    """Test that duplicate users are rejected"""
-    user_data = {
-        'username': 'testuser',
-        'email': 'test@example.com',
-        'preferences': {}
-    }
+def test_group_accomplishments_etag(client, reset_db):
+    """Test that an unchanged accomplishments feed answers 304"""
+    response = client.get('/api/groups/1/accomplishments')
+    assert response.status_code == 200
+    etag = response.headers['ETag']
+    
+    response = client.get('/api/groups/1/accomplishments',
+                         headers={'If-None-Match': etag})
+    assert response.status_code == 304
+
+def test_personal_streak_is_single_row(client, reset_db):
+    """Test that repeated group-less streak updates extend one row"""
+    for _ in range(2):
+        response = client.post('/api/streaks/1/update',
+                              data=EMPTY_BODY,
+                              content_type='application/json')
+        assert response.status_code == 200
     
+    conn = get_conn()
+    count = conn.execute('SELECT COUNT(*) FROM streaks WHERE user_id = 1 AND group_id IS NULL').fetchone()[0]
+    conn.close()
+    assert count == 1
+
+def test_duplicate_user_creation(client, reset_db):
+    """Test that duplicate users are rejected"""
     # Create first user
     response1 = client.post('/api/users', 
-                           data=json.dumps(user_data),
+                           data=TEST_USER,
                            content_type='application/json')
     assert response1.status_code == 201
     
     # Try to create duplicate user
     response2 = client.post('/api/users', 
-                           data=json.dumps(user_data),
+                           data=TEST_USER,
                            content_type='application/json')
     assert response2.status_code == 400
 
-def test_invalid_user_id(client, init_test_db):
+def test_create_user_hashes_with_bcrypt(client, reset_db, fast_bcrypt):
+    """Test that new passwords are stored as bcrypt hashes"""
+    response = client.post('/api/users',
+                          data=orjson.dumps({
+                              'username': 'testuser',
+                              'email': 'test@example.com',
+                              'password': 'correct horse'
+                          }),
+                          content_type='application/json')
+    assert response.status_code == 201
+    assert stored_password_hash(response.get_json()['id']).startswith('$2')
+    
+    response = client.post('/api/auth/login', data=LOGIN_REQUEST, content_type='application/json')
+    assert response.status_code == 200
+
+def test_login_upgrades_legacy_hash(client, legacy_user, fast_bcrypt):
+    """Test that a salt:sha256 user can log in and is rehashed with bcrypt"""
+    response = client.post('/api/auth/login', data=LOGIN_REQUEST, content_type='application/json')
+    assert response.status_code == 200
+    assert response.get_json()['id'] == 1
+    assert stored_password_hash(1).startswith('$2')
+    
+    # The upgraded hash still accepts the same password
+    response = client.post('/api/auth/login', data=LOGIN_REQUEST, content_type='application/json')
+    assert response.status_code == 200
+
+@pytest.mark.parametrize('payload', [WRONG_PASSWORD_LOGIN, UNKNOWN_EMAIL_LOGIN],
+                         ids=['wrong_password', 'unknown_email'])
+def test_login_rejects_bad_credentials(client, legacy_user, payload):
+    """Test that bad passwords and unknown emails fail the same way"""
+    response = client.post('/api/auth/login', data=payload, content_type='application/json')
+    assert response.status_code == 401
+    assert response.get_json() == {'error': 'Invalid email or password'}
+    assert not stored_password_hash(1).startswith('$2')
+
+def test_login_unknown_email_checks_dummy_hash(client, legacy_user, monkeypatch):
+    """Test that unknown emails still pay for a bcrypt check against DUMMY_HASH"""
+    import app as studystreak
+    original_verify = studystreak.verify_password
+    checked = []
+    def recording_verify(password, stored_hash):
+        checked.append(stored_hash)
+        return original_verify(password, stored_hash)
+    monkeypatch.setattr('app.verify_password', recording_verify)
+    
+    response = client.post('/api/auth/login', data=UNKNOWN_EMAIL_LOGIN, content_type='application/json')
+    assert response.status_code == 401
+    assert checked == [studystreak.DUMMY_HASH]
+
+def test_login_verify_timeout(client, legacy_user, monkeypatch):
+    """Test that a saturated verify pool answers 503 and drops the queued check"""
+    # The pool's only worker is busy, so the login's check waits in the queue
+    verify_pool = ThreadPoolExecutor(max_workers=1)
+    release = threading.Event()
+    verify_pool.submit(release.wait)
+    checked = []
+    def recording_verify(password, stored_hash):
+        checked.append(stored_hash)
+        return True
+    monkeypatch.setattr('app.verify_pool', verify_pool)
+    monkeypatch.setattr('app.verify_password', recording_verify)
+    monkeypatch.setattr('app.LOGIN_VERIFY_TIMEOUT_SECONDS', 0.01)
+    
+    response = client.post('/api/auth/login', data=LOGIN_REQUEST, content_type='application/json')
+    assert response.status_code == 503
+    with client.session_transaction() as sess:
+        assert 'user_id' not in sess
+    
+    # Once the worker frees up, the cancelled check never runs
+    release.set()
+    verify_pool.shutdown(wait=True)
+    assert checked == []
+
+def test_invalid_user_id(client, reset_db):
     """Test handling of invalid user IDs"""
     response = client.get('/api/dashboard/999')
     assert response.status_code == 200  # Should return error in data, not 404
-    data = json.loads(response.data)
+    data = response.get_json()
     assert 'error' in data
 
 if __name__ == '__main__':
@@ -7,6 +7,6 @@ sys.path.insert(0, os.path.dirname(__file__))
 
 from app import app
 
-# This is the entry point for Vercel
-def handler(request):
-    return app(request.environ, lambda *args: None)
+# This is the entry point for Vercel: the runtime serves WSGI apps directly,
+# so the Flask app is exported as-is rather than wrapped per request
+application = app